@@ -0,0 +1,22 @@
+import pytest
+from pymtl3 import DefaultPassGroup
+
+
+@pytest.fixture(scope="session")
+def elaborated():
+    """ Return a factory that builds, elaborates and applies DefaultPassGroup
+        to a component, reusing the instance for repeated configurations.
+        Callers should reset the returned instance before driving it.
+    """
+    cache = {}
+
+    def get_elaborated(cls, *args, **kwargs):
+        key = (cls, repr(args), repr(sorted(kwargs.items())))
+        if key not in cache:
+            testinst = cls(*args, **kwargs)
+            testinst.elaborate()
+            testinst.apply(DefaultPassGroup())
+            cache[key] = testinst
+        return cache[key]
+    yield get_elaborated
+    cache.clear()
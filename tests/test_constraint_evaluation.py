@@ -86,6 +86,11 @@ def test_suggested():
     print(len(mappings))
     assert tp == 15419
 
+    # Only fix the inter-PE unrolling, and solve for the rest.
+    outer_soln = {key: suggested_soln[key] for key in suggested_soln if key[-1] == 'O'}
+    mappings, tp = constraint_evaluation.find_mappings(hwb, workload_conv0, 288, False, suggested_solution=outer_soln, search_unsuggested=True)
+    assert tp == 15419
+
     
 def test_preload():
     """Test yaml schema validation"""
@@ -381,6 +386,77 @@ def test_G():
     return tp
 
 
+def test_cached():
+    """Test that repeated searches reuse earlier results"""
+    hwb = {
+        "block_name": "ml_block",
+        "MAC_info": { "num_units": 30, "data_widths": {"W":4, "I":4, "O": 8}},
+        "access_patterns": {"AP1":1, "AP2":10, "AP3": 3, "AP4": 1, "AP5": 1},
+        "ports": [
+            {"name":"a_in", "width":32, "direction": "in", "type":"W"},
+            {"name":"b_out", "width":32, "direction": "out", "type":"I"},
+            {"name":"res_out", "width":128, "direction": "out", "type":"O"},
+        ]
+    }
+    workload_fc1 = {'B':1000,'C':1024,
+                      'E':1,'PX':1,
+                      'PY':1,'RX':1,
+                      'RY':1}
+    mappings, tp = constraint_evaluation.find_mappings(hwb, workload_fc1, 288, False)
+    mappings[0]['BO'] = 0
+    mappings2, tp2 = constraint_evaluation.find_mappings(copy.deepcopy(hwb), dict(workload_fc1), 288, False)
+    assert tp2 == tp == 4193
+    assert mappings2[0]['BO'] > 0
+
+
+def test_unique_solutions():
+    """Test that equivalent mappings are only returned once"""
+    hwb = {
+        "block_name": "ml_block",
+        "MAC_info": { "num_units": 30, "data_widths": {"W":4, "I":4, "O": 8}},
+        "access_patterns": {"AP1":1, "AP2":10, "AP3": 3, "AP4": 1, "AP5": 1},
+        "ports": [
+            {"name":"a_in", "width":32, "direction": "in", "type":"W"},
+            {"name":"b_out", "width":32, "direction": "out", "type":"I"},
+            {"name":"res_out", "width":128, "direction": "out", "type":"O"},
+        ]
+    }
+    workload_conv0 = {'B':1,'C':3,
+                     'E':32,'PX':224,
+                     'PY':224,'RX':3,
+                     'RY':3}
+    mappings, tp = constraint_evaluation.find_mappings(hwb, workload_conv0, 288, False, num_solutions=5000)
+    assert tp == 14101
+    mapping_strs = [str(sorted(mapping.items())) for mapping in mappings]
+    assert len(set(mapping_strs)) == len(mapping_strs)
+
+
+def test_tied_solutions():
+    """Test that equally scored mappings are ordered by their factors"""
+    hwb = {
+        "block_name": "ml_block",
+        "MAC_info": { "num_units": 30, "data_widths": {"W":4, "I":4, "O": 8}},
+        "access_patterns": {"AP1":1, "AP2":10, "AP3": 3, "AP4": 1, "AP5": 1},
+        "ports": [
+            {"name":"a_in", "width":32, "direction": "in", "type":"W"},
+            {"name":"b_out", "width":32, "direction": "out", "type":"I"},
+            {"name":"res_out", "width":128, "direction": "out", "type":"O"},
+        ]
+    }
+    workload_conv1 = {'B':1,'C':64,
+                      'E':128,'PX':56,
+                      'PY':56,'RX':1,
+                      'RY':1}
+    mappings, tp = constraint_evaluation.find_mappings(hwb, workload_conv1, 288, True, num_solutions=3)
+    assert tp == 15519
+    spatial = [{key: mapping[key] for key in ['CI', 'CO', 'EI', 'EO']}
+               for mapping in mappings]
+    # The second and third mappings both take 16840 cycles.
+    assert spatial == [{'CI': 10, 'CO': 7, 'EI': 3, 'EO': 22},
+                       {'CI': 8, 'CO': 8, 'EI': 3, 'EO': 22},
+                       {'CI': 9, 'CO': 8, 'EI': 3, 'EO': 22}]
+
+
 #def test_ANet_all_layers():
 #    l = test_ANet_L1()
 #    l = l + test_ANet_L2()
@@ -1,4 +1,5 @@
 """Tests for `verilog_ml_benchmark_generator` pyMTL Components."""
+import functools
 import numpy
 import pytest
 import random
@@ -15,6 +16,22 @@ import utils
 import module_classes
 import cli
 
+_BITS_CACHE = {}
+
+def bits(width, value):
+    """ Return a shared Bits constant, so that repeated stimulus values don't
+        allocate a new Bits (or fall back to the int path of @=) per write.
+        @= copies the value, so sharing the constant is safe.
+    """
+    key = (width, value)
+    if key not in _BITS_CACHE:
+        _BITS_CACHE[key] = mk_bits(width)(value)
+    return _BITS_CACHE[key]
+
+def bits_list(width, values):
+    """ Convert a list of stimulus values into shared Bits constants """
+    return [bits(width, value) for value in values]
+
 def merge_bus(v,width):
     sum = 0
     for i in range(len(v)):
@@ -36,23 +53,26 @@ def load_buffer(testinst, we_portname, addr_portname, datain_portname, buffer_va
     curr_we = getattr(testinst, we_portname)
     addr_port = getattr(testinst, addr_portname)
     datain_port = getattr(testinst, datain_portname)
+    sim_tick = outertestinst.sim_tick
     curr_we @= 1
     for i in range(len(buffer_values)):
         addr_port @= i
         datain_port @= merge_bus(buffer_values[i], dwidth)
-        outertestinst.sim_tick()
+        sim_tick()
     curr_we @= 0
 
 def load_buffers_sm(testinst, datain_portname, buffer_values, dwidth, outertestinst=None):
     if not outertestinst:
         outertestinst = testinst
     datain_port = getattr(testinst, datain_portname)
+    sm_start = testinst.sm_start
+    sim_tick = outertestinst.sim_tick
     for j in range(len(buffer_values)):  # For each buffer...
         for i in range(len(buffer_values[j])):
-            outertestinst.sim_tick()
+            sim_tick()
             datain_port @= merge_bus(buffer_values[j][i], dwidth)
-            testinst.sm_start @= 0
-    outertestinst.sim_tick()
+            sm_start @= 0
+    sim_tick()
 
 def check_buffers(testinst, outer_inst, inner_inst_name, buffer_values, dwidth,
                   outertestinst=None, buf_start=0):
@@ -65,11 +85,12 @@ def load_mlb_values(testinst, chainlen, chainstart, buflen, addr_portname, en_po
         outertestinst = testinst
     addr_port = getattr(testinst, addr_portname)
     en_port = getattr(testinst, en_portname)
+    sim_tick = outertestinst.sim_tick
     en_port @= 1
     for i in range(chainlen):
         prev_addr = (chainstart+i) % buflen
         addr_port @= prev_addr
-        outertestinst.sim_tick()
+        sim_tick()
     en_port @= 0
 
 def check_mac_weight_values(proj_yaml, curr_mlb,
@@ -243,20 +264,40 @@ def check_weight_contents(testinst, proj_yaml, mlb_name, weight_out_name,
 def stream_mlb_values(testinst, time, addr_portnames, os, buf_lens, en_portnames, starti = 0, outertestinst=None):
     if not outertestinst:
         outertestinst = testinst
-    for en_portname in en_portnames:
-        en_port = getattr(testinst, en_portname)
+    en_ports = [getattr(testinst, en_portname) for en_portname in en_portnames]
+    addr_streams = [(getattr(testinst, addr_portnames[r]), buf_lens[r], os[r])
+                    for r in range(len(addr_portnames))]
+    sim_tick = outertestinst.sim_tick
+    for en_port in en_ports:
         en_port @= 1
     for i in range(starti, time+starti):
-        for r in range(len(addr_portnames)):
-            addr_port = getattr(testinst, addr_portnames[r])
-            addr = i % buf_lens[r]
-            addr_port @= addr + os[r]
-        outertestinst.sim_tick()
-    for en_portname in en_portnames:
-        en_port = getattr(testinst, en_portname)
+        for addr_port, buf_len, offset in addr_streams:
+            addr_port @= i % buf_len + offset
+        sim_tick()
+    for en_port in en_ports:
         en_port @= 0
     return i
 
+def stream_mlb_values_batched(testinst, sections, addr_portname, buf_len,
+                              en_portname, outertestinst=None):
+    """ Stream several (start, length) address sections back to back.
+        Equivalent to calling stream_mlb_values once per section, since the
+        enable would only be toggled between sections without a clock edge.
+    """
+    if not outertestinst:
+        outertestinst = testinst
+    addr_port = getattr(testinst, addr_portname)
+    en_port = getattr(testinst, en_portname)
+    sim_tick = outertestinst.sim_tick
+    i = 0
+    en_port @= 1
+    for section_start, section_length in sections:
+        for i in range(section_start, section_start + section_length):
+            addr_port @= i % buf_len
+            sim_tick()
+    en_port @= 0
+    return i
+
 def read_out_stored_buffer_values(testinst, inner_inst, addr_portname, dataout_portname,
                                 buffer_values, dwidth, outertestinst=None):
     if not outertestinst:
@@ -268,10 +309,11 @@ def read_out_stored_buffer_values(testinst, inner_inst, addr_portname, dataout_p
     except:
         dataout_port = getattr(inner_inst, dataout_portname)
         
+    sim_tick = outertestinst.sim_tick
     for i in range(len(buffer_values)):
         dataout_val = getattr(inner_inst.sim_model_inst0,"V"+str(i))
         addr_port @= i
-        outertestinst.sim_tick()
+        sim_tick()
         curr_obuf_out = int(dataout_port)
         assert(curr_obuf_out == dataout_val.dataout)
         for section in range(len(buffer_values[i])):
@@ -282,8 +324,9 @@ def read_out_stored_buffer_values(testinst, inner_inst, addr_portname, dataout_p
 def read_out_stored_buffer_values_from_sm(dataout_portname,
                                 buffer_values, dwidth, outertestinst):
     dataout_port = getattr(outertestinst, dataout_portname)
+    sim_tick = outertestinst.sim_tick
     for i in range(len(buffer_values)):
-        outertestinst.sim_tick()
+        sim_tick()
         curr_obuf_out = int(dataout_port)
         for section in range(len(buffer_values[i])):
             buffer_values[i][section] = int(curr_obuf_out%(2**dwidth))
@@ -744,6 +787,25 @@ def gen_constraint_file(chain_file, outfile,
             
     
 
+@functools.lru_cache(maxsize=None)
+def get_reduction_indices(outer_un, inner_un, temp_un, outer_uw, inner_uw,
+                          temp_ub, ibuf_len):
+    """ Flattened reduction loop indices used by get_expected_outputs_old,
+        shared between calls with the same unrolling factors. The returned
+        arrays are read-only.
+    """
+    urno, urni, urnt, urwo, urwi = numpy.indices(
+        (outer_un, inner_un, temp_un, outer_uw, inner_uw)).reshape(5, -1)
+    urw = urwo * inner_uw + urwi
+    ubts = numpy.arange(outer_uw - 1, temp_ub)
+    # Input activations outside of the buffer contribute nothing
+    i_offset = ubts[:, None] - urw[None, :]
+    i_valid = (i_offset >= 0) & (i_offset < ibuf_len)
+    indices = (urno, urni, urnt, urwo, urwi, urw, ubts, i_valid)
+    for arr in indices:
+        arr.flags.writeable = False
+    return indices
+
 def get_expected_outputs_old(obuf, ostreams_per_buf, wbuf, ibuf,
                              ivalues_per_buf, projection):
     """  Calculate the expected contents of the output buffer
@@ -757,8 +819,10 @@ def get_expected_outputs_old(obuf, ostreams_per_buf, wbuf, ibuf,
         :param projection: unrolling factor vector
     """
     obuf_len = len(obuf[0])
-    wbuf_len = len(wbuf[0])
-    ibuf_len = len(ibuf[0])
+    wbuf = numpy.array(wbuf)
+    ibuf = numpy.array(ibuf)
+    wbuf_len = wbuf.shape[1]
+    ibuf_len = ibuf.shape[1]
 
     # Get unrolling factors
     inner_uw = projection["inner_projection"]["RX"]
@@ -783,94 +847,91 @@ def get_expected_outputs_old(obuf, ostreams_per_buf, wbuf, ibuf,
         temp_proj.get("PX", 1)
     temp_un = temp_proj.get("RY", 1) * temp_proj.get("C", 1)
     temp_ue = temp_proj.get("E", 1)
+    i_stream_width = utils.get_proj_stream_count(
+        projection["inner_projection"], 'I')
+
+    # Each partial sum is a dot product over the flattened reduction loops,
+    # computed for every output position ubt at once.
+    urno, urni, urnt, urwo, urwi, urw, ubts, i_valid = get_reduction_indices(
+        outer_un, inner_un, temp_un, outer_uw, inner_uw, temp_ub, ibuf_len)
+    if len(ubts) == 0:
+        return obuf
 
     for (ugt, uet, ugo, ubo, ueo, ugi, ubi, uei) in utils.range8D(
             temp_ug, temp_ue, outer_ug, outer_ub, outer_ue, inner_ug,
             inner_ub, inner_ue):
-        for ubt in range(outer_uw - 1, temp_ub):
-            correct_sum = 0
-            # Accumulate a partial sum
-            for (urno, urni, urnt, urwo, urwi, f, g, h) in utils.range8D(
-                    outer_un, inner_un, temp_un, outer_uw, inner_uw):
-
-                # Find the corresponding weight in the weight buffers
-                if ("PRELOAD" in projection["inner_projection"]):
-                    mlb_chain_len = inner_ug * inner_ue * inner_un * inner_uw
-                    w_buf_inst_idx = \
-                        ugi * inner_ue * inner_un * inner_uw + \
-                        uei * inner_un * inner_uw + \
-                        urni * inner_uw + \
-                        urwi
-                    bus_idx = 0
-                    stream_width = 1
-                else:
-                    mlb_chain_len = 1
-                    w_buf_inst_idx = 0
-                    bus_idx = ugi * inner_ue * inner_un * inner_uw + \
-                        uei * inner_un * inner_uw + \
-                        urni * inner_uw + \
-                        urwi
-                    stream_width = inner_ug * inner_ue * inner_un * \
-                        inner_uw
-
-                if ("PRELOAD" in projection["outer_projection"]):
-                    w_buf_inst_idx = (ugo * outer_ue * outer_un * outer_uw +
-                                      ueo * outer_un * outer_uw +
-                                      urno * outer_uw +
-                                      urwo) * mlb_chain_len + \
-                        w_buf_inst_idx
-                    outer_chain_len = (outer_ug * outer_ue * outer_uw *
-                                       outer_un)
-                    buffer_cnt = 0
-                else:
-                    outer_chain_len = 1
-                    stream_idx = ugo * outer_ue * outer_un * outer_uw + \
-                        ueo * outer_un * outer_uw + \
-                        urno * outer_uw + \
-                        urwo
-                    streams_per_buffer = math.floor(len(wbuf[0][0]) /
-                                                    stream_width)
-                    buffer_cnt = math.floor(stream_idx / streams_per_buffer)
-                    bus_idx = (stream_idx % streams_per_buffer) * \
-                        stream_width + bus_idx
-
-                urw = urwo * inner_uw + urwi
-                buffer_idx = (outer_chain_len * mlb_chain_len -
-                              w_buf_inst_idx - 1)
-                buffer_idx += ugt * temp_ue * temp_un + uet * temp_un
-                w = wbuf[buffer_cnt][(buffer_idx + urnt) % wbuf_len][bus_idx]
-
-                # Now find the corresponding input activation value
-                if ((ubt - urw) >= 0) and ((ubt - urw) < ibuf_len):
-                    i_stream_idx = (outer_ub * outer_un * ugo +
-                                    ubo * outer_un +
-                                    urno)
-                    i_value_idx = i_stream_idx * \
-                        utils.get_proj_stream_count(projection["inner_projection"],
-                                              'I') + \
-                        (inner_ub * inner_un * ugi + ubi * inner_un + urni)
-                    ibuf_idx = math.floor(i_value_idx / ivalues_per_buf)
-                    iv_idx = i_value_idx % ivalues_per_buf
-
-                    # Add to the current partial sum
-                    correct_sum += (ibuf[ibuf_idx][(ugt * temp_ub * temp_un
-                                                    + ubt*temp_un
-                                                    + urnt - urw) %
-                                                   ibuf_len][iv_idx] * w)
-
-            # Find the corresponding location in the output buffers
-            out_act_idx = ugo * outer_ub * outer_ue * inner_ug * \
-                inner_ub * inner_ue + \
-                ubo * outer_ue * inner_ug * inner_ub * inner_ue + \
-                ueo * inner_ug * inner_ub * inner_ue + \
-                ugi * inner_ub * inner_ue + \
-                ubi * inner_ue + \
-                uei
-            obuf_idx = math.floor(out_act_idx / ostreams_per_buf)
-            os_idx = out_act_idx % ostreams_per_buf
-            ot_idx = ugt * temp_ub * temp_ue + uet * temp_ub + ubt
-            obuf[obuf_idx][ot_idx][os_idx] = correct_sum % \
-                (2 ** projection["data_widths"]["I"])
+        # Find the corresponding weights in the weight buffers
+        if ("PRELOAD" in projection["inner_projection"]):
+            mlb_chain_len = inner_ug * inner_ue * inner_un * inner_uw
+            w_buf_inst_idx = \
+                ugi * inner_ue * inner_un * inner_uw + \
+                uei * inner_un * inner_uw + \
+                urni * inner_uw + \
+                urwi
+            bus_idx = 0
+            stream_width = 1
+        else:
+            mlb_chain_len = 1
+            w_buf_inst_idx = 0
+            bus_idx = ugi * inner_ue * inner_un * inner_uw + \
+                uei * inner_un * inner_uw + \
+                urni * inner_uw + \
+                urwi
+            stream_width = inner_ug * inner_ue * inner_un * \
+                inner_uw
+
+        if ("PRELOAD" in projection["outer_projection"]):
+            w_buf_inst_idx = (ugo * outer_ue * outer_un * outer_uw +
+                              ueo * outer_un * outer_uw +
+                              urno * outer_uw +
+                              urwo) * mlb_chain_len + \
+                w_buf_inst_idx
+            outer_chain_len = (outer_ug * outer_ue * outer_uw *
+                               outer_un)
+            buffer_cnt = 0
+        else:
+            outer_chain_len = 1
+            stream_idx = ugo * outer_ue * outer_un * outer_uw + \
+                ueo * outer_un * outer_uw + \
+                urno * outer_uw + \
+                urwo
+            streams_per_buffer = wbuf.shape[2] // stream_width
+            buffer_cnt = stream_idx // streams_per_buffer
+            bus_idx = (stream_idx % streams_per_buffer) * \
+                stream_width + bus_idx
+
+        buffer_idx = (outer_chain_len * mlb_chain_len -
+                      w_buf_inst_idx - 1)
+        buffer_idx += ugt * temp_ue * temp_un + uet * temp_un
+        w = wbuf[buffer_cnt, (buffer_idx + urnt) % wbuf_len, bus_idx]
+
+        # Now find the corresponding input activation values
+        i_stream_idx = (outer_ub * outer_un * ugo +
+                        ubo * outer_un +
+                        urno)
+        i_value_idx = i_stream_idx * i_stream_width + \
+            (inner_ub * inner_un * ugi + ubi * inner_un + urni)
+        ibuf_idx = i_value_idx // ivalues_per_buf
+        iv_idx = i_value_idx % ivalues_per_buf
+        it_idx = (ugt * temp_ub * temp_un + ubts[:, None] * temp_un +
+                  urnt - urw) % ibuf_len
+        i = numpy.where(i_valid, ibuf[ibuf_idx, it_idx, iv_idx], 0)
+        correct_sums = numpy.einsum('tk,k->t', i, w) % \
+            (2 ** projection["data_widths"]["I"])
+
+        # Find the corresponding location in the output buffers
+        out_act_idx = ugo * outer_ub * outer_ue * inner_ug * \
+            inner_ub * inner_ue + \
+            ubo * outer_ue * inner_ug * inner_ub * inner_ue + \
+            ueo * inner_ug * inner_ub * inner_ue + \
+            ugi * inner_ub * inner_ue + \
+            ubi * inner_ue + \
+            uei
+        obuf_idx = math.floor(out_act_idx / ostreams_per_buf)
+        os_idx = out_act_idx % ostreams_per_buf
+        ot_base = ugt * temp_ub * temp_ue + uet * temp_ub
+        for ubt, correct_sum in zip(ubts.tolist(), correct_sums.tolist()):
+            obuf[obuf_idx][ot_base + ubt][os_idx] = correct_sum
     return obuf
 
     
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 """Tests for `verilog_ml_benchmark_generator` pyMTL Components."""
+import itertools
 import numpy
 import pytest
 import random
@@ -15,42 +16,40 @@ from verilog_ml_benchmark_generator import cli
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from test_helpers import *
-    
-def test_ActivationWrapper():
+
+
+ACTIVATION_WRAPPER_TEST_VECS = [
+    {"ins":[4,3, False], "outs":[[7,7],[8,0]]},
+    {"ins":[4,2, False], "outs":[[3,3],[5,0],[9,0]]},
+    {"ins":[3,5, False], "outs":[[3,3],[4,0]]}, # 100 -> 0
+    {"ins":[4,4, True], "outs":[[7,7],[8,0]]},
+    {"ins":[4,2, True], "outs":[[3,3],[5,0],[9,0]]}, # 0101 
+    {"ins":[3,5, True], "outs":[[3,Bits5(3)],[4,Bits5(0)]]},
+]
+
+
+@pytest.mark.parametrize("testvec", ACTIVATION_WRAPPER_TEST_VECS)
+def test_ActivationWrapper(elaborated, testvec):
     """Test Component class RELU"""
-    test_vecs = [
-        {"ins":[4,3, False], "outs":[[7,7],[8,0]]},
-        {"ins":[4,2, False], "outs":[[3,3],[5,0],[9,0]]},
-        {"ins":[3,5, False], "outs":[[3,3],[4,0]]}, # 100 -> 0
-        {"ins":[4,4, True], "outs":[[7,7],[8,0]]},
-        {"ins":[4,2, True], "outs":[[3,3],[5,0],[9,0]]}, # 0101 
-        {"ins":[3,5, True], "outs":[[3,Bits5(3)],[4,Bits5(0)]]},
-    ]
-    i = 0
-    for testvec in test_vecs:
-        print("VEC" + str(testvec))
-        i = i + 1
-        testinst = module_classes.ActivationWrapper(len(testvec["outs"]),
-                                                    {'type': "RELU"},
-                                       testvec["ins"][0],
-                                       testvec["ins"][1],
-                                       testvec["ins"][2])
-        testinst.elaborate()
-        testinst.apply(DefaultPassGroup())
-        for pairidx in range(len(testvec["outs"])):
-            input_bus = getattr(testinst, "activation_function_in_"+ \
-                                str(pairidx))
-            input_bus @= testvec["outs"][pairidx][0]
-        testinst.sim_tick()
-        for pairidx in range(len(testvec["outs"])):
-            output_bus = getattr(testinst, "activation_function_out_"+ \
-                                 str(pairidx))
-            assert output_bus == testvec["outs"][pairidx][1]
+    testinst = elaborated(module_classes.ActivationWrapper,
+                          len(testvec["outs"]), {'type': "RELU"},
+                          *testvec["ins"])
+    testinst.sim_reset()
+    for pairidx in range(len(testvec["outs"])):
+        input_bus = getattr(testinst, "activation_function_in_"+ \
+                            str(pairidx))
+        input_bus @= testvec["outs"][pairidx][0]
+    testinst.sim_tick()
+    for pairidx in range(len(testvec["outs"])):
+        output_bus = getattr(testinst, "activation_function_out_"+ \
+                             str(pairidx))
+        assert output_bus == testvec["outs"][pairidx][1]
 
+
+def test_ActivationWrapper_illegal():
+    """Test Component class RELU with an unknown activation function"""
     testinst = module_classes.ActivationWrapper(2, {'type': "notRELU"},
-                                                test_vecs[0]["ins"][0],
-                                                test_vecs[0]["ins"][1],
-                                                test_vecs[0]["ins"][2])
+                                                *ACTIVATION_WRAPPER_TEST_VECS[0]["ins"])
                                                 
     with pytest.raises(AssertionError):
         testinst.elaborate()
@@ -194,34 +193,42 @@ def test_HWB_Wrapper():
     assert testinst.F_0 == 0
     assert testinst.F_1 == 0
     
-def test_MergeBusses():
+MERGE_BUSSES_TEST_VECS = [
+    {"ins":[2,4,4,4,1], "outs":[[0,1,2,3],[0,1,2,3]]},
+    {"ins":[2,4,5,2,2], "outs":[[0,1,2,3],[4,14]]},
+    {"ins":[3,8,23,4,6], "outs":[[0,1,2,3,4,5,6,7],[181896,62,0,0]]},
+    {"ins":[2,4,4,4], "outs":[[0,1,2,3],[4,14,0,0]]},
+    {"ins":[2,4,5,2], "outs":[[0,1,2,3],[4,14]]},
+    {"ins":[3,8,23,4], "outs":[[0,1,2,3,4,5,6,7],[1754760,7,0,0]]},
+]
+for testvec in MERGE_BUSSES_TEST_VECS:
+    testvec["stimulus"] = bits_list(testvec["ins"][0], testvec["outs"][0])
+
+
+@pytest.mark.parametrize("testvec", MERGE_BUSSES_TEST_VECS)
+def test_MergeBusses(elaborated, testvec):
     """Test Component class MergeBusses"""
-    test_vecs = [
-        {"ins":[2,4,4,4,1], "outs":[[0,1,2,3],[0,1,2,3]]},
-        {"ins":[2,4,5,2,2], "outs":[[0,1,2,3],[4,14]]},
-        {"ins":[3,8,23,4,6], "outs":[[0,1,2,3,4,5,6,7],[181896,62,0,0]]},
-        {"ins":[2,4,4,4], "outs":[[0,1,2,3],[4,14,0,0]]},
-        {"ins":[2,4,5,2], "outs":[[0,1,2,3],[4,14]]},
-        {"ins":[3,8,23,4], "outs":[[0,1,2,3,4,5,6,7],[1754760,7,0,0]]},
-    ]
-    for testvec in test_vecs:
-        if len(testvec["ins"]) == 5:
-            testinst = module_classes.MergeBusses(testvec["ins"][0],
-                        testvec["ins"][1], testvec["ins"][2], testvec["ins"][3],
-                        ins_per_out=testvec["ins"][4])
-        else:
-            testinst = module_classes.MergeBusses(testvec["ins"][0],
-                        testvec["ins"][1], testvec["ins"][2], testvec["ins"][3])
-        testinst.elaborate()
-        testinst.apply(DefaultPassGroup())
-        for i in range(len(testvec["outs"][0])):
-            in_bus = getattr(testinst, "input_"+str(i))
-            in_bus @= testvec["outs"][0][i]
-        testinst.sim_tick()
-        for i in range(len(testvec["outs"][1])):
-            out_bus = getattr(testinst, "output_"+str(i))
-            assert out_bus == testvec["outs"][1][i]
-      
+    if len(testvec["ins"]) == 5:
+        testinst = elaborated(module_classes.MergeBusses,
+                              *testvec["ins"][:4],
+                              ins_per_out=testvec["ins"][4])
+    else:
+        testinst = elaborated(module_classes.MergeBusses,
+                              *testvec["ins"])
+    testinst.sim_reset()
+    in_buses = [getattr(testinst, f"input_{i}")
+                for i in range(len(testvec["outs"][0]))]
+    out_buses = [getattr(testinst, f"output_{i}")
+                 for i in range(len(testvec["outs"][1]))]
+    for in_bus, v in zip(in_buses, testvec["stimulus"]):
+        in_bus @= v
+    testinst.sim_tick()
+    for out_bus, v in zip(out_buses, testvec["outs"][1]):
+        assert out_bus == v
+
+
+def test_MergeBusses_illegal():
+    """Test Component class MergeBusses with invalid parameters"""
     illegal_test_vecs = [
         #{"ins":[2,4,5,8,3]}, # ins per out not possible 
         #{"ins":[2,8,16,3,2]}, # not enough outputs 
@@ -237,32 +244,41 @@ def test_MergeBusses():
                         testvec["ins"][1], testvec["ins"][2], testvec["ins"][3])
         with pytest.raises(AssertionError):
             testinst.elaborate()
-    
-def test_WeightInterconnect():
+
+
+WEIGHT_INTERCONNECT_TEST_VECS = [ # bufferwidth, mlbwidth, mlbwidthused, num_buffers, num_mlbs, proj.
+    {"ins":[8,8,3,4,10,{'C':1,'RX':1, 'RY':2,
+                      'B':1,'PX':2,'PY':1,'E':2,
+                      'G':1}],  
+     "outs":[[8,26,44,62],[0,1,2,3,0,1,2,3,0,0]]},  #0000 1000 / 0001 1010 / 0010 1100 
+    {"ins":[8,8,3,4,15,{'C':1,'RX':2, 'RY':1,
+                      'B':3,'PX':1,'PY':1,'E':1,
+                      'G':2}],  
+     "outs":[[8,26,44,62],[0,1,0,1,0,1,2,3,2,3,2,3,0,0,0]]},
+]
+for testvec in WEIGHT_INTERCONNECT_TEST_VECS:
+    testvec["stimulus"] = bits_list(testvec["ins"][0], testvec["outs"][0])
+
+
+@pytest.mark.parametrize("testvec", WEIGHT_INTERCONNECT_TEST_VECS)
+def test_WeightInterconnect(elaborated, testvec):
     """Test Component class WeightInterconnect"""
-    test_vecs = [ # bufferwidth, mlbwidth, mlbwidthused, num_buffers, num_mlbs, proj.
-        {"ins":[8,8,3,4,10,{'C':1,'RX':1, 'RY':2,
-                          'B':1,'PX':2,'PY':1,'E':2,
-                          'G':1}],  
-         "outs":[[8,26,44,62],[0,1,2,3,0,1,2,3,0,0]]},  #0000 1000 / 0001 1010 / 0010 1100 
-        {"ins":[8,8,3,4,15,{'C':1,'RX':2, 'RY':1,
-                          'B':3,'PX':1,'PY':1,'E':1,
-                          'G':2}],  
-         "outs":[[8,26,44,62],[0,1,0,1,0,1,2,3,2,3,2,3,0,0,0]]},
-    ]
-    for testvec in test_vecs:
-        testinst = module_classes.WeightInterconnect(testvec["ins"][0],
-                    testvec["ins"][1], testvec["ins"][2], testvec["ins"][3],
-                    testvec["ins"][4], testvec["ins"][5])
-        testinst.elaborate()
-        testinst.apply(DefaultPassGroup())
-        for i in range(len(testvec["outs"][0])):
-            in_bus = getattr(testinst, "inputs_from_buffer_"+str(i))
-            in_bus @= testvec["outs"][0][i]
-        testinst.sim_tick()
-        for i in range(len(testvec["outs"][1])):
-            out_bus = getattr(testinst, "outputs_to_mlb_"+str(i))
-            assert out_bus == testvec["outs"][1][i]
+    testinst = elaborated(module_classes.WeightInterconnect,
+                          *testvec["ins"])
+    testinst.sim_reset()
+    in_buses = [getattr(testinst, f"inputs_from_buffer_{i}")
+                for i in range(len(testvec["outs"][0]))]
+    out_buses = [getattr(testinst, f"outputs_to_mlb_{i}")
+                 for i in range(len(testvec["outs"][1]))]
+    for in_bus, v in zip(in_buses, testvec["stimulus"]):
+        in_bus @= v
+    testinst.sim_tick()
+    for out_bus, v in zip(out_buses, testvec["outs"][1]):
+        assert out_bus == v
+
+
+def test_WeightInterconnect_illegal():
+    """Test Component class WeightInterconnect with invalid parameters"""
     illegal_test_vecs = [
         {"ins":[8,2,3,4,10,{'C':2,'RX':1,
                           'B':2,'PX':1,'PY':1,'E':2,
@@ -280,70 +296,83 @@ def test_WeightInterconnect():
                         testvec["ins"][1], testvec["ins"][2], testvec["ins"][3],
                         testvec["ins"][4], testvec["ins"][5])
             testinst.elaborate()
-    
-def test_InputInterconnect():
+
+
+INPUT_INTERCONNECT_TEST_VECS = [ # bufferwidth, mlbwidth, mlbwidthused, num_buffers, num_mlbs, proj.
+    {"ins":[8,8,3,2,10,{'C':2, 'RX':2, 'RY':1,
+                      'B':1,'PX':2,'PY':1,'E':1,
+                      'G':1}],  
+     "outs":[[62,26],[1,2,3,4,5,6,7,8,9,10],[6,1,7,3,2,5,3,7,0,0]]},
+    {"ins":[8,8,3,2,10,{'C':1, 'RX':2, 'RY':2,
+                      'B':2,'PX':1,'PY':1,'E':1,
+                      'G':1}],  
+     "outs":[[62,26],[1,2,3,4,5,6,7,8,9,10],[6,1,6,3,2,5,2,7,0,0]]},
+     # 111 110    /   011 010
+    {"ins":[8,8,3,2,10,{'C':1,'RX':2, 'RY':1,
+                      'B':2,'PX':1,'PY':1,'E':2,
+                      'G':1}],  
+     "outs":[[62,26],[1,2,3,4,5,6,7,8,9,10],[6,1,6,3,7,5,7,7,0,0]]}
+]
+for testvec in INPUT_INTERCONNECT_TEST_VECS:
+    testvec["stimulus"] = bits_list(testvec["ins"][0], testvec["outs"][0])
+    testvec["mlb_stimulus"] = bits_list(testvec["ins"][1], testvec["outs"][1])
+
+
+@pytest.mark.parametrize("testvec", INPUT_INTERCONNECT_TEST_VECS)
+def test_InputInterconnect(elaborated, testvec):
     """Test Component class InputInterconnect"""
-    test_vecs = [ # bufferwidth, mlbwidth, mlbwidthused, num_buffers, num_mlbs, proj.
-        {"ins":[8,8,3,2,10,{'C':2, 'RX':2, 'RY':1,
-                          'B':1,'PX':2,'PY':1,'E':1,
-                          'G':1}],  
-         "outs":[[62,26],[1,2,3,4,5,6,7,8,9,10],[6,1,7,3,2,5,3,7,0,0]]},
-        {"ins":[8,8,3,2,10,{'C':1, 'RX':2, 'RY':2,
-                          'B':2,'PX':1,'PY':1,'E':1,
-                          'G':1}],  
-         "outs":[[62,26],[1,2,3,4,5,6,7,8,9,10],[6,1,6,3,2,5,2,7,0,0]]},
-         # 111 110    /   011 010
-        {"ins":[8,8,3,2,10,{'C':1,'RX':2, 'RY':1,
-                          'B':2,'PX':1,'PY':1,'E':2,
-                          'G':1}],  
-         "outs":[[62,26],[1,2,3,4,5,6,7,8,9,10],[6,1,6,3,7,5,7,7,0,0]]}
-    ]
-    for testvec in test_vecs:
-        testinst = module_classes.InputInterconnect(testvec["ins"][0],
-                    testvec["ins"][1], testvec["ins"][2], testvec["ins"][3],
-                    testvec["ins"][4], testvec["ins"][5], inner_width=testvec["ins"][2])
-        testinst.elaborate()
-        testinst.apply(DefaultPassGroup())
-        for i in range(len(testvec["outs"][0])):
-            in_bus = getattr(testinst, "inputs_from_buffer_"+str(i))
-            in_bus @= testvec["outs"][0][i]
-        for i in range(len(testvec["outs"][1])):
-            in_bus = getattr(testinst, "inputs_from_mlb_"+str(i))
-            in_bus @= testvec["outs"][1][i]
-        testinst.sim_tick()
-        for i in range(len(testvec["outs"][2])):
-            out_bus = getattr(testinst, "outputs_to_mlb_"+str(i))
-            print("--", testvec, " - ", i)
-            print(out_bus)
-            print(testvec["outs"][2][i])
-            assert out_bus == testvec["outs"][2][i]
-        #assert(0) 0 111 1 110     and 11 010  
-        
-    
-def test_OutputPSInterconnect():
+    testinst = elaborated(module_classes.InputInterconnect,
+                          *testvec["ins"],
+                          inner_width=testvec["ins"][2])
+    testinst.sim_reset()
+    buf_buses = [getattr(testinst, f"inputs_from_buffer_{i}")
+                 for i in range(len(testvec["outs"][0]))]
+    mlb_buses = [getattr(testinst, f"inputs_from_mlb_{i}")
+                 for i in range(len(testvec["outs"][1]))]
+    out_buses = [getattr(testinst, f"outputs_to_mlb_{i}")
+                 for i in range(len(testvec["outs"][2]))]
+    for in_bus, v in zip(buf_buses, testvec["stimulus"]):
+        in_bus @= v
+    for in_bus, v in zip(mlb_buses, testvec["mlb_stimulus"]):
+        in_bus @= v
+    testinst.sim_tick()
+    for i, out_bus in enumerate(out_buses):
+        print("--", testvec, " - ", i)
+        print(out_bus)
+        print(testvec["outs"][2][i])
+        assert out_bus == testvec["outs"][2][i]
+    #assert(0) 0 111 1 110     and 11 010  
+
+
+OUTPUT_PS_INTERCONNECT_TEST_VECS = [ # afwidth, mlbwidth, mlbwidthused, num_afs, num_mlbs, proj.
+    {"ins":[3,10,6,6,10,{'C':2,'RX':2, 'RY':1,
+                      'B':2,'PX':1,'PY':1,'E':1,
+                      'G':1}],  
+     "outs":[[62,0,0,62,26,0,0,26,0,0],[6,7,2,3,0,0],[0,62,0,0,0,26,0,0,0,0]]}
+]
+for testvec in OUTPUT_PS_INTERCONNECT_TEST_VECS:
+    testvec["stimulus"] = bits_list(testvec["ins"][1], testvec["outs"][0])
+
+
+@pytest.mark.parametrize("testvec", OUTPUT_PS_INTERCONNECT_TEST_VECS)
+def test_OutputPSInterconnect(elaborated, testvec):
     """Test Component class InputInterconnect"""
-    test_vecs = [ # afwidth, mlbwidth, mlbwidthused, num_afs, num_mlbs, proj.
-        {"ins":[3,10,6,6,10,{'C':2,'RX':2, 'RY':1,
-                          'B':2,'PX':1,'PY':1,'E':1,
-                          'G':1}],  
-         "outs":[[62,0,0,62,26,0,0,26,0,0],[6,7,2,3,0,0],[0,62,0,0,0,26,0,0,0,0]]}
-    ]
-    for testvec in test_vecs:
-        testinst = module_classes.OutputPSInterconnect(testvec["ins"][0],
-                    testvec["ins"][1], testvec["ins"][2], testvec["ins"][3],
-                    testvec["ins"][4], testvec["ins"][5])
-        testinst.elaborate()
-        testinst.apply(DefaultPassGroup())
-        for i in range(len(testvec["outs"][0])):
-            in_bus = getattr(testinst, "inputs_from_mlb_"+str(i))
-            in_bus @= testvec["outs"][0][i]
-        testinst.sim_tick()
-        for i in range(len(testvec["outs"][1])):
-            out_bus = getattr(testinst, "outputs_to_afs_"+str(i))
-            assert out_bus == Bits3(testvec["outs"][1][i])
-        for i in range(len(testvec["outs"][2])):
-            out_bus = getattr(testinst, "outputs_to_mlb_"+str(i))
-            assert out_bus == testvec["outs"][2][i]
+    testinst = elaborated(module_classes.OutputPSInterconnect,
+                          *testvec["ins"])
+    testinst.sim_reset()
+    in_buses = [getattr(testinst, f"inputs_from_mlb_{i}")
+                for i in range(len(testvec["outs"][0]))]
+    af_buses = [getattr(testinst, f"outputs_to_afs_{i}")
+                for i in range(len(testvec["outs"][1]))]
+    out_buses = [getattr(testinst, f"outputs_to_mlb_{i}")
+                 for i in range(len(testvec["outs"][2]))]
+    for in_bus, v in zip(in_buses, testvec["stimulus"]):
+        in_bus @= v
+    testinst.sim_tick()
+    for out_bus, v in zip(af_buses, testvec["outs"][1]):
+        assert out_bus == Bits3(v)
+    for out_bus, v in zip(out_buses, testvec["outs"][2]):
+        assert out_bus == v
 
 def test_Datapath():
     """Test Component class Datapath"""
@@ -411,26 +440,27 @@ def test_Datapath():
     testinst.apply(DefaultPassGroup())
     testinst.sim_reset()
     
+    inner_proj = projection["inner_projection"]
+    outer_proj = projection["outer_projection"]
+
     # Calculate required buffers etc.
-    mlb_count = utils.get_mlb_count(projection["outer_projection"])
-    mac_count = utils.get_mlb_count(projection["inner_projection"])
+    mlb_count = utils.get_mlb_count(outer_proj)
+    mac_count = utils.get_mlb_count(inner_proj)
     ibuf_len = 2**ib_spec["ports"][0]["width"]
     obuf_len = 2**ib_spec["ports"][0]["width"]
     wbuf_len = 2**wb_spec["ports"][0]["width"]
-    print(obuf_len)
     # Load the weight buffer
     wbuf_count = 1
-    weight_stream_count = utils.get_proj_stream_count(projection["outer_projection"], 'W')
-    wvalues_per_stream = utils.get_proj_stream_count(projection["inner_projection"], 'W')
+    weight_stream_count = utils.get_proj_stream_count(outer_proj, 'W')
+    wvalues_per_stream = utils.get_proj_stream_count(inner_proj, 'W')
     wstream_bitwidth = wvalues_per_stream*projection["data_widths"]["W"]
     wstreams_per_buf = math.floor(wb_spec["ports"][1]["width"]/wstream_bitwidth)
     wbuf_count = math.ceil(weight_stream_count / wstreams_per_buf)
     wvalues_per_buf = min(wstreams_per_buf*wvalues_per_stream, wvalues_per_stream*weight_stream_count)
     
-    wbuf = [[[random.randint(0,3)
-            for k in range(wvalues_per_buf)]    # values per word
-            for i in range(wbuf_len)]           # words per buffer
-            for j in range(wbuf_count)]         # buffer count
+    # Buffer count x words per buffer x values per word
+    wbuf = numpy.random.randint(0, 4, size=(wbuf_count, wbuf_len,
+                                            wvalues_per_buf)).tolist()
     load_buffers(testinst, "weight_modules_portawe_{}_top",
                 "weight_modules_portaaddr_top", "weight_datain",
                 wbuf, projection["data_widths"]["W"])
@@ -439,24 +469,22 @@ def test_Datapath():
                 wbuf, projection["data_widths"]["W"])
     
     # Calculate required buffers etc.
-    iouter_stream_count = utils.get_proj_stream_count(projection["outer_projection"], 'I')
-    iouter_stream_width = utils.get_proj_stream_count(projection["inner_projection"], 'I') * \
+    iouter_stream_count = utils.get_proj_stream_count(outer_proj, 'I')
+    iouter_stream_width = utils.get_proj_stream_count(inner_proj, 'I') * \
                          projection["data_widths"]["I"]
-    ototal_stream_count = utils.get_proj_stream_count(projection["outer_projection"], 'O') * \
-                          utils.get_proj_stream_count(projection["inner_projection"], 'O') 
+    ototal_stream_count = utils.get_proj_stream_count(outer_proj, 'O') * \
+                          utils.get_proj_stream_count(inner_proj, 'O') 
     activation_width = projection["data_widths"]["I"]
     istreams_per_buf = math.floor(ib_spec["ports"][1]["width"]/iouter_stream_width)
-    ivalues_per_buf = istreams_per_buf*utils.get_proj_stream_count(projection["inner_projection"], 'I')
+    ivalues_per_buf = istreams_per_buf*utils.get_proj_stream_count(inner_proj, 'I')
     ostreams_per_buf = math.floor(ib_spec["ports"][1]["width"]/activation_width)
     ibuf_count = math.ceil(iouter_stream_count/istreams_per_buf)
     obuf_count = math.ceil(ototal_stream_count/ostreams_per_buf)
     
     # Load the input buffer
     # Several values per word, words per buffer, buffers...
-    ibuf = [[[random.randint(0,4)
-             for k in range(ivalues_per_buf)]            # values per word
-             for i in range(ibuf_len)]                   # words per buffer
-             for j in range (ibuf_count)]                # buffers
+    ibuf = numpy.random.randint(0, 5, size=(ibuf_count, ibuf_len,
+                                            ivalues_per_buf)).tolist()
     load_buffers(testinst, "input_act_modules_portawe_{}_top",
                 "input_act_modules_portaaddr_top", "input_datain",
                 ibuf, projection["data_widths"]["I"])
@@ -465,34 +493,27 @@ def test_Datapath():
                 ibuf, projection["data_widths"]["I"])
     
     # Now load the weights into the MLBs
-    inner_ub = projection["inner_projection"]["B"] * projection["inner_projection"]["PX"] * projection["inner_projection"]["PY"]
-    outer_ub = projection["outer_projection"]["B"] * projection["outer_projection"]["PY"] * projection["outer_projection"]["PX"]
-    wbi_section_length = projection["inner_projection"]["E"] * \
-                        projection["inner_projection"]["C"] * \
-                        projection["inner_projection"]["RY"] * \
-                        projection["inner_projection"]["RX"]
-    wbo_section_length = projection["outer_projection"]["E"] * \
-                        projection["outer_projection"]["C"] * \
-                        projection["outer_projection"]["RY"] * \
-                        projection["outer_projection"]["RX"] *\
-                        projection["inner_projection"]["G"] *  wbi_section_length
-    starti = 0
-    for ugo in range(projection["outer_projection"]["G"]):
-        for ubo in range(outer_ub):
-            for ugi in range(projection["inner_projection"]["G"] *
-                             projection["outer_projection"]["RX"] *
-                             projection["outer_projection"]["RY"] *
-                             projection["outer_projection"]["C"] *
-                             projection["outer_projection"]["E"]):
-                for ubi in range(inner_ub):
-                    wbi_section_start = wbo_section_length*ugo + wbi_section_length*ugi
-                    print(wbi_section_start)
-                    starti = stream_mlb_values(testinst, wbi_section_length,
-                              ["weight_modules_portaaddr_top"],
-                              [0],
-                              [wbuf_len],
-                              ["mlb_modules_a_en_top"], starti=wbi_section_start)
-      
+    inner_ub = inner_proj["B"] * inner_proj["PX"] * inner_proj["PY"]
+    outer_ub = outer_proj["B"] * outer_proj["PY"] * outer_proj["PX"]
+    outer_un = outer_proj["C"] * outer_proj["RY"]
+    wbi_section_length = inner_proj["E"] * inner_proj["C"] * \
+        inner_proj["RY"] * inner_proj["RX"]
+    wbo_section_length = outer_proj["E"] * outer_un * outer_proj["RX"] * \
+        inner_proj["G"] * wbi_section_length
+    inner_sections = inner_proj["G"] * outer_proj["RX"] * outer_un * \
+        outer_proj["E"]
+    # The start address doesn't depend on ubo/ubi, but the repeats are
+    # needed: the weights are shifted along the preload chains, so each
+    # section is streamed once per batch-replicated MLB / MAC.
+    sections = [(wbo_section_length*ugo + wbi_section_length*ugi,
+                 wbi_section_length)
+                for ugo, ubo, ugi, ubi in itertools.product(
+                    range(outer_proj["G"]), range(outer_ub),
+                    range(inner_sections), range(inner_ub))]
+    stream_mlb_values_batched(testinst, sections,
+                              "weight_modules_portaaddr_top", wbuf_len,
+                              "mlb_modules_a_en_top")
+
     # Check they are right
     assert(check_mlb_chains_values(testinst, mlb_count, mac_count, 1, 1,
                             "ml_block_inst_{}", "weight_out_{}", wbuf,
@@ -513,32 +534,21 @@ def test_Datapath():
 
     #print(testinst.output_act_modules.mlb_outs_inst_0.sim_model_inst0.data)
     
-    obuf = [[[0
-             for i in range(ostreams_per_buf)]
-             for i in range(obuf_len)]
-             for j in range (obuf_count)]
+    obuf = numpy.zeros((obuf_count, obuf_len, ostreams_per_buf),
+                       dtype=numpy.int64)
     obuf = get_expected_outputs_old(obuf, ostreams_per_buf,
                                 wbuf,
                                 ibuf, ivalues_per_buf,
                                 projection)
     
-    obuf_results = [[[[0]
-             for i in range(ostreams_per_buf)]
-             for i in range(obuf_len)]
-             for j in range (obuf_count)]
+    obuf_results = numpy.zeros((obuf_count, obuf_len, ostreams_per_buf),
+                               dtype=numpy.int64)
 
     obuf_results = read_out_stored_values(testinst, "input_act_modules_portaaddr_o_top", "dataout",
                                           obuf_results, projection["data_widths"]["I"], start_buffer=len(ibuf))
     
-    
-    print("EXPECTED: " + str(obuf))
-    print("ACTUAL: " + str(obuf_results))
-
-    print("W: " + str(wbuf))
-    print("I: " + str(ibuf))
-    for bufi in range(obuf_count):
-        for olen in range(min(obuf_len,ibuf_len)-1): #(obuf_len-1): 
-            assert obuf[bufi][olen] == obuf_results[bufi][olen]
+    olen = min(obuf_len,ibuf_len)-1 #(obuf_len-1): 
+    numpy.testing.assert_array_equal(obuf[:, :olen], obuf_results[:, :olen])
             
 def test_multiple_Datapaths():
     """Test Component class Datapath with > 1 projections"""
@@ -698,21 +708,20 @@ def test_multiple_Datapaths():
                             projection["outer_projection"]["RX"] *\
                             projection["inner_projection"]["G"] *  wbi_section_length
         starti = 0
-        for ugo in range(projection["outer_projection"]["G"]):
-            for ubo in range(outer_ub):
-                for ugi in range(projection["inner_projection"]["G"] *
-                                 projection["outer_projection"]["RX"] *
-                                 projection["outer_projection"]["C"] *
-                                 projection["outer_projection"]["RY"] *
-                                 projection["outer_projection"]["E"]):
-                    for ubi in range(inner_ub):
-                        wbi_section_start = wbo_section_length*ugo + wbi_section_length*ugi
-                        print(wbi_section_start)
-                        starti = stream_mlb_values(testinst, wbi_section_length,
-                                  ["weight_modules_portaaddr_top"],
-                                  [0],
-                                  [wbuf_len],
-                                  ["mlb_modules_a_en_top"], starti=wbi_section_start)
+        for ugo, ubo, ugi, ubi in itertools.product(
+                range(projection["outer_projection"]["G"]), range(outer_ub),
+                range(projection["inner_projection"]["G"] *
+                      projection["outer_projection"]["RX"] *
+                      projection["outer_projection"]["C"] *
+                      projection["outer_projection"]["RY"] *
+                      projection["outer_projection"]["E"]),
+                range(inner_ub)):
+            wbi_section_start = wbo_section_length*ugo + wbi_section_length*ugi
+            starti = stream_mlb_values(testinst, wbi_section_length,
+                      ["weight_modules_portaaddr_top"],
+                      [0],
+                      [wbuf_len],
+                      ["mlb_modules_a_en_top"], starti=wbi_section_start)
           
         # Check they are right
         print("\nCheck that the MLB values are right!")
@@ -918,21 +927,20 @@ def test_Datapath_pingpong():
     testinst.bank_sel @= 0
     for wbuf in [wbuf1,wbuf2]:
         starti = 0
-        for ugo in range(projection["outer_projection"]["G"]):
-            for ubo in range(outer_ub):
-                for ugi in range(projection["inner_projection"]["G"] *
-                                 projection["outer_projection"]["RX"] *
-                                 projection["outer_projection"]["RY"] *
-                                 projection["outer_projection"]["C"] *
-                                 projection["outer_projection"]["E"]):
-                    for ubi in range(inner_ub):
-                        wbi_section_start = wbo_section_length*ugo + wbi_section_length*ugi
-                        print(wbi_section_start)
-                        starti = stream_mlb_values(testinst, wbi_section_length,
-                                  ["weight_modules_portaaddr_top"],
-                                  [0],
-                                  [wbuf_len],
-                                  ["mlb_modules_a_en_top"], starti=wbi_section_start)
+        for ugo, ubo, ugi, ubi in itertools.product(
+                range(projection["outer_projection"]["G"]), range(outer_ub),
+                range(projection["inner_projection"]["G"] *
+                      projection["outer_projection"]["RX"] *
+                      projection["outer_projection"]["RY"] *
+                      projection["outer_projection"]["C"] *
+                      projection["outer_projection"]["E"]),
+                range(inner_ub)):
+            wbi_section_start = wbo_section_length*ugo + wbi_section_length*ugi
+            starti = stream_mlb_values(testinst, wbi_section_length,
+                      ["weight_modules_portaaddr_top"],
+                      [0],
+                      [wbuf_len],
+                      ["mlb_modules_a_en_top"], starti=wbi_section_start)
           
         # Check they are right
         assert(check_mlb_chains_values(testinst, mlb_count, mac_count, 1, 1,
@@ -2,6 +2,8 @@
 
 """Tests for `verilog_ml_benchmark_generator` package utilities."""
 
+import math
+import numpy
 import pytest
 import os
 import sys
@@ -196,7 +198,39 @@ def test_get_overall_idx():
                           'B':1,'E':1,
                           'G':3}
         utils.get_overall_idx(projection_example, {"C":0,"G":-1})
-        
+
+
+def test_get_overall_idx_array():
+    """Test util function get_overall_idx_array"""
+    projection_example = {'C':5,'RX':6,
+                          'B':7,'E':8,
+                          'G':9}
+    keys = ['C', 'RX', 'G']
+    grid = dict(zip(keys, numpy.indices([5, 6, 9]).reshape(3, -1)))
+    idxs = utils.get_overall_idx_array(projection_example, grid)
+    expected = [utils.get_overall_idx(projection_example,
+                                      {'C':c, 'RX':rx, 'G':g})
+                for c in range(5) for rx in range(6) for g in range(9)]
+    assert idxs.tolist() == expected
+
+    # Orders given as lists of names, as in utils.input_order
+    grid = dict(zip(['C', 'G'], numpy.indices([5, 9]).reshape(2, -1)))
+    idxs = utils.get_overall_idx_array(projection_example, grid,
+                                       order=utils.input_order)
+    expected = [utils.get_overall_idx_new(projection_example,
+                                          {'C':c, 'G':g},
+                                          order=utils.input_order)
+                for c in range(5) for g in range(9)]
+    assert idxs.tolist() == expected
+
+
+def test_get_chain_end_idxs():
+    """Test util function get_chain_end_idxs"""
+    assert utils.get_chain_end_idxs(1, 1, 1, 1, 1, 1) == {0}
+    assert utils.get_chain_end_idxs(2, 3, 1, 1, 1, 4) == \
+        {3, 7, 11, 15, 19, 23}
+    assert utils.get_chain_end_idxs(1, 2, 2, 1, 1, 3) == {2, 5, 8, 11}
+
 
 def test_connect_in_out_to_top():
     """Test util function connect_in_to_top and connect_out_to_top"""
@@ -315,6 +349,24 @@ def test_chain_ports():
     assert testinst.OUT_3 == 2
     assert testinst.OUT_4 == 0
 
+def test_tie_off_unconnected_mlbs():
+    """Test util function tie_off_unconnected_mlbs"""
+    class test_function(Component):
+        def construct(s, n=3):
+            outp = utils.AddOutPort(s, 8, "outputs_to_mlb_1")
+            outp //= 5
+            utils.AddInPort(s, 8, "inputs_from_mlb_1")
+            utils.tie_off_unconnected_mlbs(s, n, 8, {1})
+    testinst = test_function()
+    testinst.elaborate()
+    testinst.apply(DefaultPassGroup())
+    testinst.sim_tick()
+    assert testinst.outputs_to_mlb_0 == 0
+    assert testinst.outputs_to_mlb_1 == 5
+    assert testinst.outputs_to_mlb_2 == 0
+    for i in range(3):
+        assert hasattr(testinst, "inputs_from_mlb_" + str(i))
+
 def test_print_table():
     """Test util function print_table"""
     test_list = [["a","bbbbbb", "cc"],
@@ -477,3 +529,8 @@ def test_merge_bus():
 
         
         
+
+
+def test_clog2():
+    for count in range(0, 70):
+        assert utils.clog2(count) == math.ceil(math.log(max(count, 2), 2))
@@ -1,26 +1,49 @@
-from logilab import constraint
+import constraint
 import sys
 import math
 import copy
+import functools
+import heapq
+import numpy
 import utils
 il = 1
 
 
+@functools.lru_cache(maxsize=None)
 def get_factors(maxv, product):
     """ Make a list of factors of product, less than maxv.
+        Each i up to sqrt(product) is paired with its cofactor
+        ceil(product / i), so only O(sqrt(product)) candidates are visited.
+        Results are cached, since the same bounds recur across loop bounds
+        and calls.
 
     :param maxv: Maximum factor size
     :param product: Product to factor
     """
     max_bound = min(maxv, math.ceil(math.sqrt(product)))
     var_range = []
+    seen = set()
     for i in range(1, max_bound + 1):
-        if i not in var_range:
+        if i not in seen:
+            seen.add(i)
             var_range += [i]
-        if (math.ceil(product / i) < maxv) and \
-           (math.ceil(product / i) not in var_range):
-            var_range += [math.ceil(product / i)]
-    return var_range
+        cofactor = -(-product // i)
+        if (cofactor < maxv) and (cofactor not in seen):
+            seen.add(cofactor)
+            var_range += [cofactor]
+    return tuple(var_range)
+
+
+@functools.lru_cache(maxsize=None)
+def get_level_keys(loop_bounds, level):
+    """ Make the list of mapping vector keys for each loop bound at a given
+        level (eg. BO, CO, EO...). Cached, since the same keys are needed
+        for every candidate solution.
+
+    :param loop_bounds: Tuple of layer loop bounds
+    :param level: Tiling level (O, I or T)
+    """
+    return tuple(loop_bound + level for loop_bound in loop_bounds)
 
 
 def score_layer(solution, num_MACs, loop_bounds, preload_i, preload_o):
@@ -34,14 +57,10 @@ def score_layer(solution, num_MACs, loop_bounds, preload_i, preload_o):
     """
     # calculate an approximate cycle count
     total_cycles = 0
-    product_cycles = get_product(
-        solution, [loop_bound + 'T' for loop_bound in loop_bounds])
-    num_used_PEs = get_product(
-        solution,
-        [loop_bound + 'O' for loop_bound in loop_bounds])
-    num_used_MACs = get_product(
-        solution,
-        [loop_bound + 'I' for loop_bound in loop_bounds])
+    loop_bounds = tuple(loop_bounds)
+    product_cycles = get_product(solution, get_level_keys(loop_bounds, 'T'))
+    num_used_PEs = get_product(solution, get_level_keys(loop_bounds, 'O'))
+    num_used_MACs = get_product(solution, get_level_keys(loop_bounds, 'I'))
     preload_o = min(preload_o, num_used_PEs)
     if (preload_o < 0):
         preload_o = num_used_PEs
@@ -77,13 +96,17 @@ def score_solution(solution, num_MACs, loop_bounds, preload_i, preload_o,
     # calculate an approximate cycle count
     if layer_info and (len(layer_info) > 0):
         total_cycles = 0
+        loop_bounds = tuple(loop_bounds)
+        level_keys = list(zip(loop_bounds,
+                              get_level_keys(loop_bounds, 'I'),
+                              get_level_keys(loop_bounds, 'O'),
+                              get_level_keys(loop_bounds, 'T')))
         for layer in layer_info:
-            for loop_bound in loop_bounds:
+            for loop_bound, key_i, key_o, key_t in level_keys:
                 total_bound = layer.get(loop_bound, 1)
-                spatial_factor = solution[loop_bound + 'I'] * \
-                    solution[loop_bound + 'O']
+                spatial_factor = solution[key_i] * solution[key_o]
                 temporal_factor = math.ceil(total_bound / spatial_factor)
-                solution[loop_bound + 'T'] = temporal_factor
+                solution[key_t] = temporal_factor
             total_cycles = total_cycles + score_layer(solution, num_MACs,
                                                       loop_bounds,
                                                       preload_i, preload_o)
@@ -101,19 +124,171 @@ def ApproximateProductConstraint(x, val0=1, val1=1, val2=1, val3=1, val4=1,
     :param x: Expected product
     :param val0-val7: Factors
     """
+    vals = (val0, val1, val2, val3, val4, val5, val6, val7)
     min_product = (val0 * val1 * val2 * val3 * val4 * val5 * val6 * val7)
-    max_product = max(
-        (val0 - 1) * val1 * val2 * val3 * val4 * val5 * val6 * val7,
-        val0 * (val1 - 1) * val2 * val3 * val4 * val5 * val6 * val7,
-        val0 * val1 * (val2 - 1) * val3 * val4 * val5 * val6 * val7,
-        val0 * val1 * val2 * (val3 - 1) * val4 * val5 * val6 * val7,
-        val0 * val1 * val2 * val3 * (val4 - 1) * val5 * val6 * val7,
-        val0 * val1 * val2 * val3 * val4 * (val5 - 1) * val6 * val7,
-        val0 * val1 * val2 * val3 * val4 * val5 * (val6 - 1) * val7,
-        val0 * val1 * val2 * val3 * val4 * val5 * val6 * (val7 - 1))
+    # Decrementing the largest factor gives the largest reduced product.
+    max_product = min_product - min_product // max(vals)
     return ((min_product >= x) and (max_product <= x))
 
 
+class MaxProductConstraint(constraint.Constraint):
+    """ Make sure that product of given factors is at most maxv.
+        Partial assignments are checked too, assuming each unassigned
+        factor takes its smallest remaining value, and values of unassigned
+        factors that would exceed the bound are pruned (forward checking).
+    """
+    def __init__(s, maxv):
+        """ Constructor for MaxProductConstraint
+
+        :param maxv: Maximum product
+        """
+        s.maxv = maxv
+
+    def __call__(s, variables, domains, assignments, forwardcheck=False):
+        min_product = 1
+        unassigned = []
+        for variable in variables:
+            if variable in assignments:
+                min_product *= assignments[variable]
+            else:
+                domain = domains[variable]
+                if not domain:
+                    return False
+                unassigned += [(variable, min(domain))]
+                min_product *= unassigned[-1][1]
+        if min_product > s.maxv:
+            return False
+        if forwardcheck:
+            for variable, min_value in unassigned:
+                # Largest value that still fits, given the smallest
+                # possible values of the other factors.
+                max_factor = s.maxv // (min_product // min_value)
+                domain = domains[variable]
+                for value in domain[:]:
+                    if value > max_factor:
+                        domain.hideValue(value)
+        return True
+
+
+@functools.lru_cache(maxsize=None)
+def get_approximate_product_tuples(x, var_ranges):
+    """ Find all combinations of values from var_ranges that satisfy
+        ApproximateProductConstraint, evaluated for the whole grid
+        of candidates at once. Results are cached, since layers tend to
+        share loop bounds.
+
+    :param x: Expected product
+    :param var_ranges: Tuple of possible values for each factor
+    """
+    grids = numpy.meshgrid(*[numpy.array(var_range, dtype=numpy.int64)
+                             for var_range in var_ranges], indexing='ij')
+    min_product = numpy.prod(grids, axis=0)
+    # Decrementing the largest factor gives the largest reduced product.
+    max_product = min_product - min_product // numpy.max(grids, axis=0)
+    valid = (min_product >= x) & (max_product <= x)
+    return frozenset(zip(*[grid[valid].tolist() for grid in grids]))
+
+
+class TilingConstraint(constraint.Constraint):
+    """ Make sure that the factors of a loop bound form one of a given set
+        of valid tilings. Once all but one factor is assigned, values of
+        the last factor that don't complete a valid tiling are pruned.
+    """
+    def __init__(s, valid_tilings):
+        """ Constructor for TilingConstraint
+
+        :param valid_tilings: Set of valid tuples of factors
+        """
+        s.valid_tilings = valid_tilings
+        # Map (unassigned position, other factors) to the values that
+        # complete a valid tiling.
+        s.completions = {}
+        for tiling in valid_tilings:
+            for i in range(len(tiling)):
+                key = (i, tiling[:i] + tiling[i + 1:])
+                s.completions.setdefault(key, set()).add(tiling[i])
+
+    def __call__(s, variables, domains, assignments, forwardcheck=False):
+        vals = [assignments.get(variable) for variable in variables]
+        unassigned_count = vals.count(None)
+        if unassigned_count == 0:
+            return tuple(vals) in s.valid_tilings
+        if forwardcheck and (unassigned_count == 1):
+            i = vals.index(None)
+            completions = s.completions.get(
+                (i, tuple(vals[:i] + vals[i + 1:])), ())
+            domain = domains[variables[i]]
+            for value in domain[:]:
+                if value not in completions:
+                    domain.hideValue(value)
+            if not domain:
+                return False
+        return True
+
+
+@functools.lru_cache(maxsize=None)
+def get_tiling_constraint(x, var_ranges):
+    """ Build a TilingConstraint for the given loop bound and candidate
+        factors. Constraints are cached and shared between problems,
+        since they hold no solver state.
+
+    :param x: Expected product
+    :param var_ranges: Tuple of possible values for each factor
+    """
+    return TilingConstraint(get_approximate_product_tuples(x, var_ranges))
+
+
+def get_cycle_lower_bound(spatial_vals, layer_bounds):
+    """ Find the minimum number of temporal iterations required, given only
+        the inner and outer unrolling factors.
+
+    :param spatial_vals: O and I factors for each loop bound, in order
+    :param layer_bounds: For each layer, the list of loop bound values
+    """
+    outer_vals = spatial_vals[0::2]
+    inner_vals = spatial_vals[1::2]
+    total_cycles = 0
+    for bounds in layer_bounds:
+        layer_cycles = 1
+        for bound, outer_val, inner_val in zip(bounds, outer_vals,
+                                               inner_vals):
+            layer_cycles *= -(-bound // (outer_val * inner_val))
+        total_cycles += layer_cycles
+    return total_cycles
+
+
+class CycleBoundConstraint(constraint.Constraint):
+    """ Once enough solutions are found, reject partial solutions whose
+        estimated cycle count can't beat the worst of them. Unassigned
+        factors are assumed to take their largest remaining value, so the
+        bound holds for every completion of the partial solution.
+    """
+    def __init__(s, layer_bounds, best_solutions, num_solutions):
+        """ Constructor for CycleBoundConstraint
+
+        :param layer_bounds: For each layer, the list of loop bound values
+        :param best_solutions: Heap of best (-cost, ...) found so far
+        :param num_solutions: Number of solutions to keep
+        """
+        s.layer_bounds = layer_bounds
+        s.best_solutions = best_solutions
+        s.num_solutions = num_solutions
+
+    def __call__(s, variables, domains, assignments, forwardcheck=False):
+        if len(s.best_solutions) < s.num_solutions:
+            return True
+        vals = []
+        for variable in variables:
+            if variable in assignments:
+                vals += [assignments[variable]]
+            elif domains[variable]:
+                vals += [max(domains[variable])]
+            else:
+                return False
+        return get_cycle_lower_bound(vals, s.layer_bounds) <= \
+            -s.best_solutions[0][0]
+
+
 def get_product(var_dict, var_keys):
     """ Find the product of values in the dict with keys in ver_keys
 
@@ -126,30 +301,107 @@ def get_product(var_dict, var_keys):
     return product
 
 
+class FrozenDict(tuple):
+    """ Hashable stand-in for a dict, as a sorted tuple of items """
+
+
+def freeze(obj):
+    """ Convert nested dicts and lists into hashable tuples
+
+    :param obj: Object to convert
+    """
+    if isinstance(obj, dict):
+        return FrozenDict(sorted(((key, freeze(val))
+                                  for key, val in obj.items()),
+                                 key=lambda item: repr(item[0])))
+    elif isinstance(obj, (list, tuple)):
+        return tuple(freeze(val) for val in obj)
+    return obj
+
+
+def thaw(obj):
+    """ Convert the output of ``freeze`` back into nested dicts and lists
+
+    :param obj: Object to convert
+    """
+    if isinstance(obj, FrozenDict):
+        return {key: thaw(val) for key, val in obj}
+    elif isinstance(obj, tuple):
+        return [thaw(val) for val in obj]
+    return obj
+
+
 def find_mappings(hwb, workload, pe_count, enable_soft_logic=True,
                   suggested_solution=None, preload_o=1, preload_i=1,
                   num_solutions=1, cost_function=score_solution,
-                  buffer_count=-1, allow_px_tiling=False):
+                  buffer_count=-1, allow_px_tiling=False,
+                  search_unsuggested=False):
     """ Find the best set of mappings (according to a given cost function)
     that are achievable given the ML blocks available.
+    Results are cached, so repeated calls with identical arguments
+    don't solve the same problem again.
 
     :param hwb: Tensor block definition
     :param pe_count: Number of PEs available
     :param enable_soft_logic: Add soft-logic to PEs to enable more mappings.
-    :param suggested_solution: Proposed mapping vector
+    :param suggested_solution: Proposed (possibly partial) mapping vector
     :param preload_o: Information about weight preload method
     :param preload_i: Information about weight preload method
     :param num_solutions: number of solutions to return
     :param cost_function: function used to sort possible solutions
+    :param search_unsuggested: Solve for variables missing from
+                               suggested_solution, instead of setting them
+                               to 1
     """
+    hits = solve_for_mappings.cache_info().hits
+    min_solutions, min_product = solve_for_mappings(
+        freeze(hwb), freeze(workload), pe_count, enable_soft_logic,
+        freeze(suggested_solution), preload_o, preload_i, num_solutions,
+        cost_function, buffer_count, allow_px_tiling, search_unsuggested)
+    if solve_for_mappings.cache_info().hits > hits:
+        utils.printi(il, "Reusing previously found mappings for workload " +
+                     str(workload))
+    return copy.deepcopy(min_solutions), min_product
+
+
+@functools.lru_cache(maxsize=64)
+def solve_for_mappings(hwb, workload, pe_count, enable_soft_logic=True,
+                       suggested_solution=None, preload_o=1, preload_i=1,
+                       num_solutions=1, cost_function=score_solution,
+                       buffer_count=-1, allow_px_tiling=False,
+                       search_unsuggested=False):
+    """ Solve for the best set of mappings (according to a given cost
+    function) that are achievable given the ML blocks available.
+    ``hwb``, ``workload`` and ``suggested_solution`` are passed through
+    ``freeze`` so that the most recent results can be cached.
+
+    :param hwb: Frozen tensor block definition
+    :param workload: Frozen workload definition
+    :param pe_count: Number of PEs available
+    :param enable_soft_logic: Add soft-logic to PEs to enable more mappings.
+    :param suggested_solution: Frozen proposed (possibly partial) mapping
+                               vector
+    :param preload_o: Information about weight preload method
+    :param preload_i: Information about weight preload method
+    :param num_solutions: number of solutions to return
+    :param cost_function: function used to sort possible solutions
+    :param search_unsuggested: Solve for variables missing from
+                               suggested_solution, instead of setting them
+                               to 1
+    """
+    hwb = thaw(hwb)
+    workload = thaw(workload)
+    suggested_solution = thaw(suggested_solution)
     utils.printi(il, "Solving for optimal mapping vector. " +
                  "This may take several minutes.")
     utils.printi(il, "Workload definition: " + str(workload))
     problem = constraint.Problem()
-    hwbp = copy.deepcopy(hwb['access_patterns'])
+    hwbp = dict(hwb['access_patterns'])
     ws = not (hwb.get('output_accumulator', False))
-    loop_bounds = ['B', 'C', 'E', 'PX', 'PY', 'RX', 'RY', 'G']
+    num_MACs = hwb["MAC_info"]["num_units"]
+    loop_bounds = ('B', 'C', 'E', 'PX', 'PY', 'RX', 'RY', 'G')
     levels = ['O', 'I', 'T']
+    candidate_count = 1
     workloads = workload
     if type(workload) == dict:
         workloads = [workload]
@@ -216,40 +468,42 @@ def find_mappings(hwb, workload, pe_count, enable_soft_logic=True,
             if (max_bound_i == max(curr_bounds)):
                 min_bound_i = max(curr_bounds)
 
+        var_ranges = []
         for level in levels:
-            if (suggested_solution):
-                problem.addVariable(loop_bound+level,
-                                    [suggested_solution.get(loop_bound +
-                                                            level, 1)])
+            # Variables fixed by the suggested solution are pinned to a
+            # single value. The rest default to 1, unless they are left
+            # for the solver.
+            if (suggested_solution) and \
+               ((loop_bound + level) in suggested_solution):
+                var_range = [suggested_solution[loop_bound + level]]
+            elif (suggested_solution) and not search_unsuggested:
+                var_range = [1]
+            elif (level == 'O'):
+                var_range = get_factors(pe_count,
+                                        math.ceil(max(curr_bounds) /
+                                                  min_bound_i))
+            elif (level == 'I'):
+                var_range = range(min_bound_i,
+                                  min(max(curr_bounds), max_bound_i) + 1)
             else:
-                if (level == 'O'):
-                    var_range = get_factors(pe_count,
-                                            math.ceil(max(curr_bounds) /
-                                                      min_bound_i))
-                elif (level == 'I'):
-                    var_range = range(min_bound_i,
-                                      min(max(curr_bounds), max_bound_i) + 1)
-                else:
-                    var_range = get_factors(sys.maxsize,
-                                            math.ceil(max(curr_bounds) /
-                                                      min_bound_i))
-                problem.addVariable(loop_bound + level, var_range)
-
+                var_range = get_factors(sys.maxsize,
+                                        math.ceil(max(curr_bounds) /
+                                                  min_bound_i))
+            problem.addVariable(loop_bound + level, var_range)
+            var_ranges += [var_range]
+            candidate_count *= len(var_range)
+
+        # Evaluate the product constraint for all candidate tilings up front,
+        # so that the solver only needs table lookups.
         nested_bounds = [loop_bound + level for level in levels]
-        problem.addConstraint(lambda val0=1, val1=1, val2=1, val3=1,
-                              val4=1, val5=1, val6=1, val7=1,
-                              maxv=max(curr_bounds):
-                              ApproximateProductConstraint(maxv, val0, val1,
-                                                           val2, val3, val4,
-                                                           val5),
-                              nested_bounds)
+        tiling_constraint = get_tiling_constraint(
+            max(curr_bounds), tuple(tuple(var_range)
+                                    for var_range in var_ranges))
+        problem.addConstraint(tiling_constraint, nested_bounds)
 
     # Ensure that product of outer tiling factors is <= # PEs
-    problem.addConstraint(
-        lambda val0=1, val1=1, val2=1, val3=1, val4=1, val5=1, val6=1, val7=1,
-        maxv=pe_count:
-        ((val0 * val1 * val2 * val3 * val4 * val5 * val6 * val7) <= maxv),
-        [loop_bound + 'O' for loop_bound in loop_bounds])
+    problem.addConstraint(MaxProductConstraint(pe_count),
+                          [loop_bound + 'O' for loop_bound in loop_bounds])
 
     # Ensure that the inner tiling factors are compatible with the PE access
     # patterns
@@ -257,13 +511,8 @@ def find_mappings(hwb, workload, pe_count, enable_soft_logic=True,
         nested_bounds = [loop_bound + 'I' for loop_bound in
                          access_patterns[access_pattern]]
         if len(nested_bounds) > 0:
-            problem.addConstraint(
-                lambda val0=1, val1=1, val2=1, val3=1,
-                val4=1, val5=1, val6=1, val7=1,
-                maxv=hwbp[access_pattern]:
-                ((val0 * val1 * val2 * val3 *
-                  val4 * val5 * val6 * val7) <= maxv),
-                nested_bounds)
+            problem.addConstraint(MaxProductConstraint(hwbp[access_pattern]),
+                                  nested_bounds)
 
     problem.addConstraint(constraint.InSetConstraint([1]), ['RXT'])
     problem.addConstraint(constraint.InSetConstraint([1]), ['RYT'])
@@ -284,21 +533,58 @@ def find_mappings(hwb, workload, pe_count, enable_soft_logic=True,
         problem.addConstraint(constraint.InSetConstraint([1]), ['PXO'])
         problem.addConstraint(constraint.InSetConstraint([1]), ['PXI'])
 
-    solutions = problem.getSolutions()
-    assert len(solutions) > 0
-
-    # Sort by estimated cycle count
+    # Each solution costs at least as many cycles as its temporal tiling
+    # needs, so once enough solutions are found, prune any partial solution
+    # whose spatial unrolling already guarantees a worse score.
+    # best_solutions is a heap of the best solutions so far, worst first.
+    # The search is kept in a single process: the pruning bound tightens
+    # as solutions are found, so splitting the search across workers would
+    # prune less.
+    # If there are no more candidates than solutions requested (e.g. a
+    # complete suggested solution), there is nothing to prune.
+    best_solutions = []
+    spatial_bounds = [loop_bound + level for loop_bound in loop_bounds
+                      for level in ['O', 'I']]
+    if (cost_function == score_solution) and \
+       (candidate_count > num_solutions):
+        layer_bounds = [[wld.get(loop_bound, 1) for loop_bound in loop_bounds]
+                        for wld in workloads]
+        problem.addConstraint(CycleBoundConstraint(layer_bounds,
+                                                   best_solutions,
+                                                   num_solutions),
+                              spatial_bounds)
+
+    # Keep only the solutions with the lowest estimated cycle count.
+    # score_solution recomputes the temporal factors from the spatial ones,
+    # so solutions that only differ in temporal factors end up identical;
+    # only score the first of them.
+    # Equally scored solutions are ordered by their factors, so the result
+    # doesn't depend on the order in which the solver visits them. Factors
+    # are negated since the heap keeps the worst solution first.
     min_product = sys.maxsize
-    num_MACs = hwb["MAC_info"]["num_units"]
-    sorted_solutions = sorted(solutions,
-                              key=lambda soln, nm=num_MACs, lbs=loop_bounds,
-                              pli=preload_i, plo=preload_o, wklds=workloads:
-                              cost_function(soln, nm, lbs, pli, plo, wklds))
-    min_solutions = sorted_solutions[0:num_solutions]
+    solution_count = 0
+    seen_spatial_factors = set()
+    for solution in problem.getSolutionIter():
+        if (cost_function == score_solution):
+            spatial_factors = tuple(solution[var] for var in spatial_bounds)
+            if spatial_factors in seen_spatial_factors:
+                continue
+            seen_spatial_factors.add(spatial_factors)
+        cost = cost_function(solution, num_MACs, loop_bounds, preload_i,
+                             preload_o, workloads)
+        solution_count += 1
+        rank = (-cost, tuple(-solution[var] for var in sorted(solution)))
+        if len(best_solutions) < num_solutions:
+            heapq.heappush(best_solutions, rank + (solution,))
+        elif rank > best_solutions[0][:2]:
+            heapq.heapreplace(best_solutions, rank + (solution,))
+    assert solution_count > 0
+    min_solutions = [solution for (cost, factors, solution) in
+                     sorted(best_solutions, reverse=True)]
     min_product = cost_function(min_solutions[0], num_MACs, loop_bounds,
                                 preload_i, preload_o, workloads)
     utils.printi(il, "Found best " + str(num_solutions) +
-                 " solutions out of " + str(len(solutions)) +
+                 " solutions out of " + str(solution_count) +
                  " possibilities, with estimated cycle count " +
                  str(min_product))
     for min_solution in min_solutions:
@@ -6,9 +6,9 @@ ASSUMPTIONS:
 - Inputs don't require muxing
 
 """
-from pymtl3 import InPort, Component, OutPort, connect, Wire
+from pymtl3 import InPort, Component, connect, Wire
 import math
-import copy
+import numpy
 import yaml
 import utils
 import inspect
@@ -32,23 +32,22 @@ class ActivationWrapper(Component):
             function_name = function
             function = {}
 
+        available_act_fns = [name for name, obj in
+                             inspect.getmembers(activation_functions,
+                                                inspect.isclass)]
+        assert(function_name in available_act_fns)
+        actclass = getattr(activation_functions, function_name)
         for i in range(count):
-            available_act_fns = [name for name, obj in
-                                 inspect.getmembers(activation_functions,
-                                                    inspect.isclass)]
-            assert(function_name in available_act_fns)
-            actclass = getattr(activation_functions, function_name)
             curr_inst = actclass(input_width, output_width, registered,
                                  params=function)
 
             setattr(s, function_name + '_inst_' + str(i), curr_inst)
+            suffix = "_" + str(i)
             for port in curr_inst.get_input_value_ports():
-                utils.connect_in_to_top(s, port, port._dsl.my_name + "_" +
-                                        str(i))
+                utils.connect_in_to_top(s, port, port._dsl.my_name + suffix)
             for port in curr_inst.get_output_value_ports():
                 newoport = utils.AddOutPort(s, output_bus_width,
-                                            port._dsl.my_name + "_" +
-                                            str(i))
+                                            port._dsl.my_name + suffix)
                 connect(port, newoport[0:output_width])
                 assert(output_bus_width >= output_width)
                 if (output_bus_width > output_width):
@@ -76,50 +75,22 @@ class MLB_Wrapper(Component):
                             onto ML block
          :type proj: dict
         """
-        copy_projs = copy.deepcopy(projs)
-        ports_by_type = {}
-        special_outs = []
-        if "simulation_model" in spec:
-            special_outs = ["DATA", "W", "I", "O", "AVALON_READDATA",
-                            "AVALON_WAITREQUEST", "AVALON_READDATAVALID"]
-
         act_functions = []
         for proj in projs:
             required_act_function = proj.get('activation_function', 'NONE')
             if (required_act_function in spec.get("output_functions", [])):
                 projection = proj["outer_projection"]
                 curr_act_function = "NONE"
-                for (ug, ue, ubb, ubx, uby, a, b, c) in utils.range8D(
+                chain_len = projection['RX'] * projection['C'] * \
+                    projection['RY']
+                if idx in utils.get_chain_end_idxs(
                         projection['G'], projection['E'], projection['B'],
-                        projection['PX'], projection['PY']):
-                    chain_idx = utils.get_overall_idx(
-                        projection, {'B': ubb, 'G': ug, 'E': ue, 'PX': ubx,
-                                     'PY': uby})
-                    chain_len = projection['RX'] * projection['C'] * \
-                        projection['RY']
-                    start_idx = chain_idx * chain_len
-                    end_idx = start_idx + chain_len - 1
-                    if (end_idx == idx):
-                        curr_act_function = required_act_function
-                        break
+                        projection['PX'], projection['PY'], chain_len):
+                    curr_act_function = required_act_function
                 act_functions = act_functions + [curr_act_function]
             else:
                 act_functions = act_functions + ["NONE"]
-        for port in spec['ports']:
-            if not port["type"] in ("CLK", "RESET"):
-                if (port["direction"] == "in"):
-                    newport = utils.AddInPort(s, port["width"], port["name"])
-                else:
-                    if port["name"] not in s.__dict__.keys():
-                        newport = utils.AddOutPort(s, port["width"],
-                                                   port["name"])
-                        if port["type"] not in special_outs:
-                            newport //= newport._dsl.Type(0)
-                typename = port["type"] + "_" + port["direction"]
-                if typename in ports_by_type:
-                    ports_by_type[typename] += [[port, newport]]
-                else:
-                    ports_by_type[typename] = [[port, newport]]
+        ports_by_type = utils.add_ports_by_type(s, spec)
         s._dsl.args = [spec.get('block_name', "unnamed")]
 
         assert(spec.get("simulation_model", "") == "MLB" or
@@ -134,59 +105,48 @@ class MLB_Wrapper(Component):
                 " in definition of " + spec["block_name"]
             assert len(ports_by_type[req_port]) == 1
 
-        inner_projs = [proj['inner_projection'] for proj in copy_projs]
-
         # Apply activation functions on the last MLB in the chain.
         s.sim_model = module_helper_classes.MLB(
-            copy_projs, sim=sim, fast_gen=fast_gen,
+            projs, sim=sim, fast_gen=fast_gen,
             op_type=spec.get('MAC_info', {}).get("type", "MAC"),
             output_functions=act_functions)
         MAC_datatypes = ['W', 'I', 'O']
-        inner_bus_counts = {
-            dtype: [utils.get_proj_stream_count(inner_proj, dtype)
-                    for inner_proj in inner_projs]
-            for dtype in MAC_datatypes}
-        inner_bus_widths = {dtype: [inner_bus_count *
-                                    proj['data_widths'][dtype]
-                                    for (proj, inner_bus_count) in
-                                    zip(copy_projs, inner_bus_counts[dtype])]
-                            for dtype in MAC_datatypes}
-        assert(ports_by_type["I_out"][0][0]['width'] ==
-               ports_by_type["I_in"][0][0]['width']), \
+        inner_bus_widths = utils.get_inner_bus_info(projs)[2]
+        max_widths = {dtype: max(inner_bus_widths[dtype])
+                      for dtype in MAC_datatypes}
+        i_width = ports_by_type["I_in"][0][0]['width']
+        o_width = ports_by_type["O_in"][0][0]['width']
+        assert(ports_by_type["I_out"][0][0]['width'] == i_width), \
             "Input and output stream widths should be equal (MLB I ports)"
         i_out = ports_by_type["I_out"][0][1]
-        assert(ports_by_type["O_out"][0][0]['width'] ==
-               ports_by_type["O_in"][0][0]['width']), \
+        assert(ports_by_type["O_out"][0][0]['width'] == o_width), \
             "Input and output stream widths should be equal (MLB O ports)"
         o_out = ports_by_type["O_out"][0][1]
         if "W_in" in ports_by_type:
             w_in = ports_by_type["W_in"][0][1]
-        assert(max(inner_bus_widths['I']) <=
-               ports_by_type["I_in"][0][0]['width']), \
+        assert(max_widths['I'] <= i_width), \
             "Specified MLB port width not wide enough for desired mappings"
         i_in = ports_by_type["I_in"][0][1]
-        assert(max(inner_bus_widths['O']) <=
-               ports_by_type["O_in"][0][0]['width']), \
+        assert(max_widths['O'] <= o_width), \
             "Specified MLB port width not wide enough for desired mappings"
         o_in = ports_by_type["O_in"][0][1]
         if "W_EN_in" in ports_by_type:
-            connect(ports_by_type["W_EN_in"][0][1], s.sim_model.W_EN)
+            s.sim_model.W_EN //= ports_by_type["W_EN_in"][0][1]
         if "W_out" in ports_by_type:
-            connect(ports_by_type["W_out"][0][1][0:max(inner_bus_widths['W'])],
-                    s.sim_model.W_OUT)
-        connect(ports_by_type["I_EN_in"][0][1], s.sim_model.I_EN)
-        connect(ports_by_type["ACC_EN_in"][0][1], s.sim_model.ACC_EN)
+            ports_by_type["W_out"][0][1][0:max_widths['W']] //= \
+                s.sim_model.W_OUT
+        s.sim_model.I_EN //= ports_by_type["I_EN_in"][0][1]
+        s.sim_model.ACC_EN //= ports_by_type["ACC_EN_in"][0][1]
         if ("MODE_in" in ports_by_type):
-            connect(ports_by_type["MODE_in"][0][1], s.sim_model.sel)
+            s.sim_model.sel //= ports_by_type["MODE_in"][0][1]
         else:
             s.sim_model.sel //= 0
-        inner_projs = [proj['inner_projection'] for proj in projs]
-        connect(i_in[0:max(inner_bus_widths['I'])], s.sim_model.I_IN)
-        connect(i_out[0:max(inner_bus_widths['I'])], s.sim_model.I_OUT)
+        s.sim_model.I_IN //= i_in[0:max_widths['I']]
+        i_out[0:max_widths['I']] //= s.sim_model.I_OUT
         if "W_in" in ports_by_type:
-            connect(w_in[0:max(inner_bus_widths['W'])], s.sim_model.W_IN)
-        connect(o_in[0:max(inner_bus_widths['O'])], s.sim_model.O_IN)
-        connect(o_out[0:max(inner_bus_widths['O'])], s.sim_model.O_OUT)
+            s.sim_model.W_IN //= w_in[0:max_widths['W']]
+        s.sim_model.O_IN //= o_in[0:max_widths['O']]
+        o_out[0:max_widths['O']] //= s.sim_model.O_OUT
 
 
 class MLB_Wrapper_added_logic(Component):
@@ -210,14 +170,17 @@ class MLB_Wrapper_added_logic(Component):
                             onto ML block
          :type proj: dict
         """
-        copy_projs = copy.deepcopy(projs)
+        # Only the inner projections are modified below, so copy just those
+        copy_projs = [dict(proj, inner_projection=dict(
+            proj['inner_projection'])) for proj in projs]
         s._dsl.args = [spec.get('block_name', "unnamed")]
 
-        inner_projs = [proj['inner_projection'] for proj in copy_projs]
+        inner_projs = [proj['inner_projection'] for proj in projs]
+        inner_projs_new = [proj['inner_projection'] for proj in copy_projs]
 
         if ("access_patterns" in spec):
-            spec_keys = copy.deepcopy(spec["access_patterns"])
-            for ip in inner_projs:
+            spec_keys = spec["access_patterns"]
+            for ip in inner_projs_new:
                 if (ip["RX"] > spec_keys["AP1"]):
                     utils.print_warning(il, "Adding additional soft" +
                                         "logic to perform windowing " +
@@ -291,8 +254,6 @@ class MLB_Wrapper_added_logic(Component):
                         utils.connect_out_to_top(s, getattr(curr_inst,
                                                  port["name"]), port["name"])
 
-        inner_projs = [proj['inner_projection'] for proj in projs]
-        inner_projs_new = [proj['inner_projection'] for proj in copy_projs]
         if ("access_patterns" in spec):
             ip = inner_projs[0]
             ip_new = inner_projs_new[0]
@@ -302,18 +263,19 @@ class MLB_Wrapper_added_logic(Component):
                 reqd_ue = ip["E"]
                 assert(spec_keys["AP3"] == 1)
                 s.ue_in = Wire(i_in_width)
-                for (urny, urnc, ug, ubb, ubx, uby, a, c) in utils.range8D(
-                        ip["RY"], ip["C"], ip["G"], ip["B"], ip["PX"],
-                        ip["PY"]):
-                    in_chain = utils.get_overall_idx_new(
-                        ip, {'RY': urny, 'C': urnc, 'PX': ubx, 'PY': uby,
-                             'B': ubb, 'G': ug}, order=utils.input_order)
-                    for ue in range(reqd_ue):
-                        out_chain = utils.get_overall_idx_new(
-                            ip_new, {'RY': urny, 'C': urnc, 'PX': ubx,
-                                     'PY': uby, 'B': ubb,
-                                     'G': (ug * reqd_ue + ue)},
-                            order=utils.input_order)
+                # Compute all chain indices up front, with the last axis of
+                # out_chains iterating over ue.
+                keys = ['RY', 'C', 'G', 'B', 'PX', 'PY']
+                grid = dict(zip(keys, numpy.indices(
+                    [ip[key] for key in keys]).reshape(len(keys), -1, 1)))
+                in_chains = utils.get_overall_idx_array(
+                    ip, grid, order=utils.input_order)
+                grid['G'] = grid['G'] * reqd_ue + numpy.arange(reqd_ue)
+                out_chains = utils.get_overall_idx_array(
+                    ip_new, grid, order=utils.input_order)
+                for in_chain, out_row in zip(in_chains[:, 0].tolist(),
+                                             out_chains.tolist()):
+                    for out_chain in out_row:
                         s.ue_in[out_chain * dataw:
                                 (out_chain + 1) * dataw] //= \
                             i_in_outer[(in_chain * dataw):
@@ -325,15 +287,15 @@ class MLB_Wrapper_added_logic(Component):
                 reqd_ub = ip["B"]*ip["PX"]*ip["PY"]
                 assert(spec_keys["AP4"] == 1)
                 s.ub_in = Wire(w_in_width)
-                for (urnx, urny, urnc, ug, ue, a, b, c) in utils.range8D(
-                        ip["RX"], ip["RY"], ip["C"], ip["G"], ip["E"]):
-                    in_chain = utils.get_overall_idx(
-                        ip, {'RX': urnx, 'C': urnc, 'RY': urny, 'E': ue,
-                             'G': ug})
-                    for ub in range(ip["B"] * ip["PX"] * ip["PY"]):
-                        out_chain = utils.get_overall_idx(
-                            ip_new, {'RX': urnx, 'C': urnc, 'RY': urny,
-                                     'E': ue, 'G': (ug * reqd_ub + ub)})
+                keys = ['RX', 'RY', 'C', 'G', 'E']
+                grid = dict(zip(keys, numpy.indices(
+                    [ip[key] for key in keys]).reshape(len(keys), -1, 1)))
+                in_chains = utils.get_overall_idx_array(ip, grid)
+                grid['G'] = grid['G'] * reqd_ub + numpy.arange(reqd_ub)
+                out_chains = utils.get_overall_idx_array(ip_new, grid)
+                for in_chain, out_row in zip(in_chains[:, 0].tolist(),
+                                             out_chains.tolist()):
+                    for out_chain in out_row:
                         s.ub_in[out_chain * dataw:
                                 (out_chain + 1) * dataw] //= \
                             w_in_outer[(in_chain * dataw):
@@ -370,27 +332,8 @@ class HWB_Sim(Component):
                             onto ML block
          :type proj: dict
         """
-        ports_by_type = {}
-        special_outs = []
-        if "simulation_model" in spec:
-            special_outs = ["DATA", "W", "I", "O", "AVALON_READDATA",
-                            "AVALON_WAITREQUEST", "AVALON_READDATAVALID"]
         assert 'ports' in spec
-        for port in spec['ports']:
-            if not port["type"] in ("CLK", "RESET"):
-                if (port["direction"] == "in"):
-                    newport = utils.AddInPort(s, port["width"], port["name"])
-                else:
-                    if port["name"] not in s.__dict__.keys():
-                        newport = utils.AddOutPort(s, port["width"],
-                                                   port["name"])
-                        if port["type"] not in special_outs:
-                            newport //= newport._dsl.Type(0)
-                typename = port["type"] + "_" + port["direction"]
-                if typename in ports_by_type:
-                    ports_by_type[typename] += [[port, newport]]
-                else:
-                    ports_by_type[typename] = [[port, newport]]
+        ports_by_type = utils.add_ports_by_type(s, spec)
         s._dsl.args = [spec.get('block_name', "unnamed")]
 
         if "simulation_model" in spec:
@@ -407,26 +350,22 @@ class HWB_Sim(Component):
                 assert (len(ports_by_type["ADDRESS_in"]) ==
                         len(ports_by_type["DATA_in"]))
                 for buffer_inst in range(len(ports_by_type["ADDRESS_in"])):
-                    assert ports_by_type["DATA_out"][buffer_inst][0]["width"] \
-                        == ports_by_type["DATA_in"][buffer_inst][0]["width"]
-                    assert ports_by_type["WEN_in"][buffer_inst][0]["width"] \
-                        == 1
-                    datalen = ports_by_type["DATA_in"][buffer_inst][0]["width"]
-                    addrlen = \
-                        ports_by_type["ADDRESS_in"][buffer_inst][0]["width"]
-                    size = 2**addrlen
+                    data_in = ports_by_type["DATA_in"][buffer_inst]
+                    data_out = ports_by_type["DATA_out"][buffer_inst]
+                    address = ports_by_type["ADDRESS_in"][buffer_inst]
+                    wen = ports_by_type["WEN_in"][buffer_inst]
+                    assert data_out[0]["width"] == data_in[0]["width"]
+                    assert wen[0]["width"] == 1
+                    datalen = data_in[0]["width"]
+                    size = 2**address[0]["width"]
                     sim_model = module_helper_classes.Buffer(
                         datalen, size, sim=sim,
                         fast_gen=fast_gen)
                     setattr(s, "sim_model_inst" + str(buffer_inst), sim_model)
-                    connect(ports_by_type["DATA_in"][buffer_inst][1],
-                            sim_model.datain)
-                    connect(ports_by_type["DATA_out"][buffer_inst][1],
-                            sim_model.dataout)
-                    connect(ports_by_type["ADDRESS_in"][buffer_inst][1],
-                            sim_model.address)
-                    connect(ports_by_type["WEN_in"][buffer_inst][1],
-                            sim_model.wen)
+                    sim_model.datain //= data_in[1]
+                    sim_model.dataout //= data_out[1]
+                    sim_model.address //= address[1]
+                    sim_model.wen //= wen[1]
             elif spec.get("simulation_model", "") == "EMIF":
                 for req_port in ["AVALON_ADDRESS_in", "AVALON_READDATA_out",
                                  "AVALON_WRITEDATA_in",
@@ -447,20 +386,20 @@ class HWB_Sim(Component):
                         'max_pipeline_transfers', {}).get(
                             'max_pipeline_transfers', 4),
                     sim=True, fast_gen=fast_gen, inner_fast_gen=inner_fast_gen)
-                connect(ports_by_type["AVALON_ADDRESS_in"][0][1],
-                        s.sim_model.avalon_address)
-                connect(ports_by_type["AVALON_WRITEDATA_in"][0][1],
-                        s.sim_model.avalon_writedata)
-                connect(s.sim_model.avalon_readdata,
-                        ports_by_type["AVALON_READDATA_out"][0][1])
-                connect(ports_by_type["AVALON_READ_in"][0][1],
-                        s.sim_model.avalon_read,)
-                connect(ports_by_type["AVALON_WRITE_in"][0][1],
-                        s.sim_model.avalon_write)
-                connect(s.sim_model.avalon_readdatavalid,
-                        ports_by_type["AVALON_READDATAVALID_out"][0][1])
-                connect(s.sim_model.avalon_waitrequest,
-                        ports_by_type["AVALON_WAITREQUEST_out"][0][1])
+                s.sim_model.avalon_address //= \
+                    ports_by_type["AVALON_ADDRESS_in"][0][1]
+                s.sim_model.avalon_writedata //= \
+                    ports_by_type["AVALON_WRITEDATA_in"][0][1]
+                s.sim_model.avalon_readdata //= \
+                    ports_by_type["AVALON_READDATA_out"][0][1]
+                s.sim_model.avalon_read //= \
+                    ports_by_type["AVALON_READ_in"][0][1]
+                s.sim_model.avalon_write //= \
+                    ports_by_type["AVALON_WRITE_in"][0][1]
+                s.sim_model.avalon_readdatavalid //= \
+                    ports_by_type["AVALON_READDATAVALID_out"][0][1]
+                s.sim_model.avalon_waitrequest //= \
+                    ports_by_type["AVALON_WAITREQUEST_out"][0][1]
 
 
 class HWB_Wrapper(Component):
@@ -483,35 +422,38 @@ class HWB_Wrapper(Component):
                       collision bug.
          :type count: string
         """
-        # Add ports shared between instances to the top level
+        # Classify the ports once: ports shared between instances are added
+        # to the top level once, all others are duplicated per instance.
+        # Clock and reset are skipped. Each entry is
+        # (name, width, shared, is_input).
+        shared_types = ('C', 'ADDRESS', 'W_EN', 'I_EN', 'ACC_EN', 'MODE')
+        inst_ports = [(port["name"], port['width'],
+                       port['type'] in shared_types and
+                       port["direction"] == "in", port["direction"] == "in")
+                      for port in spec['ports']
+                      if port['type'] not in ('CLK', 'RESET')]
+        shared_ports = {name: utils.AddInPort(s, width, name)
+                        for (name, width, shared, _) in inst_ports if shared}
+        is_mlb = spec.get("simulation_model", "") in ("MLB", "ML_Block")
+        inst_prefix = spec.get('block_name', "unnamed") + '_inst_'
         for i in range(count):
-            if (spec.get("simulation_model", "") == "MLB" or
-                    spec.get("simulation_model", "") == "ML_Block"):
+            if is_mlb:
                 curr_inst = MLB_Wrapper_added_logic(spec, projections,
                                                     fast_gen=fast_gen,
                                                     idx=i)
             else:
                 curr_inst = HWB_Sim(spec, projections, sim=True,
                                     fast_gen=fast_gen)
-            setattr(s, spec.get('block_name', "unnamed") + '_inst_' + str(i),
-                    curr_inst)
-            for port in spec['ports']:
-                if ((port['type'] == 'C' or port['type'] == 'ADDRESS' or
-                     port['type'] == 'W_EN' or port['type'] == 'I_EN' or
-                     port['type'] == 'ACC_EN' or port['type'] == 'MODE')
-                        and port["direction"] == "in"):
-                    instport = getattr(curr_inst, port["name"])
-                    instport //= utils.AddInPort(s,  port['width'],
-                                                 port["name"])
-                elif port['type'] not in ('CLK', 'RESET'):
-                    if (port['direction'] == "in"):
-                        utils.connect_in_to_top(s, getattr(curr_inst,
-                                                           port["name"]),
-                                                port["name"] + "_" + str(i))
-                    else:
-                        utils.connect_out_to_top(s, getattr(curr_inst,
-                                                            port["name"]),
-                                                 port["name"] + "_" + str(i))
+            setattr(s, inst_prefix + str(i), curr_inst)
+            suffix = "_" + str(i)
+            for (port_name, _, shared, is_input) in inst_ports:
+                instport = getattr(curr_inst, port_name)
+                if shared:
+                    instport //= shared_ports[port_name]
+                elif is_input:
+                    utils.connect_in_to_top(s, instport, port_name + suffix)
+                else:
+                    utils.connect_out_to_top(s, instport, port_name + suffix)
         utils.tie_off_clk_reset(s)
 
 
@@ -549,8 +491,7 @@ class InputBufferWrapper(Component):
                                         + "_o")
 
         # A signal to select which layer
-        layer_sel = utils.AddInPort(s, math.ceil(math.log(max(len(projections),
-                                                              2), 2)),
+        layer_sel = utils.AddInPort(s, utils.clog2(len(projections)),
                                     "sel")
 
         # Mux between two input addresses for efficient convolution.
@@ -558,7 +499,7 @@ class InputBufferWrapper(Component):
                      proj['outer_projection']['RY']
                      for proj in projections]
 
-        utils.AddInPort(s, math.ceil(math.log(max(max(mux_sizes), 2), 2)),
+        utils.AddInPort(s, utils.clog2(max(mux_sizes)),
                         "addr_sel")
         j = 0
         for proj in projections:
@@ -568,12 +509,11 @@ class InputBufferWrapper(Component):
                 for mux in range(mux_sizes[j]):
                     newmux = module_helper_classes.MUX2(
                         addr_width,
-                        math.ceil(math.log(max(mux_sizes[j], 2), 2)), k)
+                        utils.clog2(mux_sizes[j]), k)
                     setattr(s, "mux_addr" + str(j) + "_" + str(k), newmux)
                     if (mux_sizes[j] > 1):
                         newmux.sel //= \
-                            s.addr_sel[0:math.ceil(math.log(max(mux_sizes[j],
-                                                                2), 2))]
+                            s.addr_sel[0:utils.clog2(mux_sizes[j])]
                     else:
                         newmux.sel //= 0
                     newmux.in0 //= addri1
@@ -584,23 +524,40 @@ class InputBufferWrapper(Component):
         s.omux = module_helper_classes.MUX1(addr_width)
         s.omux.in0 //= addro
 
+        # Classify the ports once rather than for every instance.
+        inst_ports = []
+        for port in spec['ports']:
+            if (port['type'] in ('C', 'MODE') and
+                    port["direction"] == "in"):
+                inst_ports += [(port, 'shared')]
+            elif (port['type'] == 'ADDRESS'):
+                inst_ports += [(port, 'address')]
+                buffer_idxs_by_proj = [
+                    utils.map_buffer_idx_to_y_idx(proj, spec)
+                    for proj in projections]
+            elif (port['type'] == 'DATA'):
+                inst_ports += [(port, 'data_' + port["direction"])]
+            elif port['type'] not in ('CLK', 'RESET', 'WEN'):
+                inst_ports += [(port, port["direction"])]
+        wen_ports = [port for port in spec['ports'] if port['type'] == 'WEN']
+        shared_ports = {port["name"]: utils.AddInPort(s, port['width'],
+                                                      port["name"])
+                        for port, kind in inst_ports if kind == 'shared'}
+
+        inst_prefix = spec.get('block_name', "unnamed") + '_inst_'
         for i in range(max_total_bcount):
             curr_inst = HWB_Sim(spec, sim=True, fast_gen=fast_gen)
-            setattr(s, spec.get('block_name', "unnamed") + '_inst_' + str(i),
-                    curr_inst)
-
-            for port in spec['ports']:
-                if ((port['type'] == 'C' or port['type'] == 'MODE')
-                        and port["direction"] == "in"):
-                    instport = getattr(curr_inst, port["name"])
-                    instport //= utils.AddInPort(s,  port['width'],
-                                                 port["name"])
-                elif (port['type'] == 'ADDRESS'):
-                    instport = getattr(curr_inst, port["name"])
+            setattr(s, inst_prefix + str(i), curr_inst)
+            suffix = "_" + str(i)
+
+            for port, kind in inst_ports:
+                instport = getattr(curr_inst, port["name"])
+                if (kind == 'shared'):
+                    instport //= shared_ports[port["name"]]
+                elif (kind == 'address'):
                     muxs = []
                     for pj in range(len(projections)):
-                        buffer_idxs = utils.map_buffer_idx_to_y_idx(
-                            projections[pj], spec)
+                        buffer_idxs = buffer_idxs_by_proj[pj]
                         i_order = (i - buffer_start_idxs[pj]) % \
                             max_total_bcount
                         if (i_order < bcounts_i[pj]):
@@ -616,104 +573,93 @@ class InputBufferWrapper(Component):
                     utils.mux_ports_by_name(s, muxs, "out", curr_inst,
                                             port['name'], insel=layer_sel,
                                             sim=False, idx=str(i))
-                elif (port['type'] == 'DATA') and \
-                        (port["direction"] == "out"):
-                    utils.connect_out_to_top(
-                        s, getattr(curr_inst, port["name"]),
-                        port["name"] + "_out_" + str(i))
+                elif (kind == 'data_out'):
+                    utils.connect_out_to_top(s, instport,
+                                             port["name"] + "_out" + suffix)
 
                     if (add_SR):
                         assert(input_width > 0)
                         urwv = projections[0]['inner_projection']['RX']
                         outport = utils.AddOutPort(s, port["width"] * urwv,
-                                                   port["name"] + "_" + str(i))
-                        for vali in range(math.floor(port['width'] /
-                                                     input_width)):
+                                                   port["name"] + suffix)
+                        # All values shift together, so a single wide
+                        # shift register serves every value in the port.
+                        num_vals = port['width'] // input_width
+                        sr_width = num_vals * input_width
+                        if (num_vals > 0):
+                            assert urwv - 1 > 0
                             curr_shift_reg = \
                                 module_helper_classes.ShiftRegister(
-                                    reg_width=input_width,
-                                    length=urwv - 1, sim=False)
-                            assert urwv - 1 > 0
-                            setattr(s, "SR" + str(i) + "_" + str(vali),
-                                    curr_shift_reg)
-                            dataout = getattr(curr_inst, port["name"])
-                            curr_shift_reg.input_data //= dataout[vali *
-                                                                  input_width:
-                                                                  input_width *
-                                                                  (vali + 1)]
+                                    reg_width=sr_width, length=urwv - 1,
+                                    sim=False)
+                            setattr(s, "SR" + str(i), curr_shift_reg)
+                            curr_shift_reg.input_data //= \
+                                instport[0:sr_width]
                             curr_shift_reg.ena //= 1
-                            datain = getattr(curr_inst, port["name"])
-                            curridx = vali * \
-                                projections[0]['inner_projection']['RX']
+                            sr_outs = [getattr(curr_shift_reg,
+                                               "out" + str(outi))
+                                       for outi in range(urwv - 1)]
+                        for vali in range(num_vals):
+                            val_start = vali * input_width
+                            val_end = val_start + input_width
+                            curridx = vali * urwv
                             outport[input_width * curridx:
                                     input_width * (curridx + 1)] //= \
-                                datain[vali * input_width:
-                                       input_width * (vali + 1)]
-                            wv = projections[0]['inner_projection']['RX']
-                            for outi in range(1, wv):
-                                curridx = vali * wv + outi
+                                instport[val_start:val_end]
+                            for outi in range(1, urwv):
+                                curridx = vali * urwv + outi
                                 outport[input_width * curridx:
                                         input_width * (curridx + 1)] //= \
-                                    getattr(curr_shift_reg, "out" +
-                                            str(outi - 1))
+                                    sr_outs[outi - 1][val_start:val_end]
                     else:
-                        utils.connect_out_to_top(s, getattr(curr_inst,
-                                                            port["name"]),
-                                                 port["name"] + "_" + str(i))
-                elif (port['type'] == 'DATA') and \
-                        (port["direction"] == "in"):
-                    instport = utils.AddInPort(s, port['width'],
-                                               port["name"] + "_" + str(i))
-                    instport_new = utils.AddInPort(s, port['width'],
-                                                   port["name"] + "_" +
-                                                   str(i) + "_out")
-                    datain = getattr(curr_inst, port['name'])
-                    newmux = module_helper_classes.MUX2(port['width'], 1)
-                    setattr(s, "input_data_mux" + str(i), newmux)
-                    newmux.in0 //= instport_new
-                    newmux.in1 //= instport
-                    datain //= newmux.out
-                elif port['type'] not in ('CLK', 'RESET', 'WEN'):
-                    if (port['direction'] == "in"):
-                        utils.connect_in_to_top(s, getattr(curr_inst,
-                                                           port["name"]),
-                                                port["name"] + "_" + str(i))
-                    else:
-                        utils.connect_out_to_top(s, getattr(curr_inst,
-                                                            port["name"]),
-                                                 port["name"] + "_" + str(i))
+                        utils.connect_out_to_top(s, instport,
+                                                 port["name"] + suffix)
+                elif (kind == 'data_in'):
+                    topport = utils.AddInPort(s, port['width'],
+                                              port["name"] + suffix)
+                    topport_new = utils.AddInPort(s, port['width'],
+                                                  port["name"] + suffix +
+                                                  "_out")
+                    data_mux = module_helper_classes.MUX2(port['width'], 1)
+                    setattr(s, "input_data_mux" + str(i), data_mux)
+                    data_mux.in0 //= topport_new
+                    data_mux.in1 //= topport
+                    instport //= data_mux.out
+                elif (kind == 'in'):
+                    utils.connect_in_to_top(s, instport,
+                                            port["name"] + suffix)
+                else:
+                    utils.connect_out_to_top(s, instport,
+                                             port["name"] + suffix)
 
-            for port in spec['ports']:
+            for port in wen_ports:
                 # Mux between the input buffer write enable signal
                 # and the output buffer write enable signal depending on
                 # whether this is an input or output buffer
-                if (port['type'] == 'WEN'):
-                    assert(port["direction"] == "in")
-                    # Add ports for both the input and output buffers.
-                    instport = utils.AddInPort(s, port['width'],
-                                               port["name"] + "_" + str(i))
-                    instport_new = utils.AddInPort(s, port['width'],
-                                                   port["name"] + "_" +
-                                                   str(i) + "_out")
-                    wen_in = getattr(curr_inst, port['name'])
-
-                    # Mux between the different layers, connecting either
-                    # the input activation WEN or output activation WEN.
-                    newmux = module_helper_classes.MUXN(1, len(bcounts_i))
-                    setattr(s, "input_wen_mux" + str(i), newmux)
-                    for tt in range(len(bcounts_i)):
-                        currin = getattr(newmux, "in" + str(tt))
-                        i_order = (i - buffer_start_idxs[tt]) % \
-                            max_total_bcount
-                        if (i_order < bcounts_i[tt]):
-                            currin //= instport
-                        else:
-                            currin //= instport_new
-                    newmux.sel //= layer_sel
-                    wen_in //= newmux.out
+                assert(port["direction"] == "in")
+                # Add ports for both the input and output buffers.
+                instport = utils.AddInPort(s, port['width'],
+                                           port["name"] + suffix)
+                instport_new = utils.AddInPort(s, port['width'],
+                                               port["name"] + suffix + "_out")
+                wen_in = getattr(curr_inst, port['name'])
+
+                # Mux between the different layers, connecting either
+                # the input activation WEN or output activation WEN.
+                newmux = module_helper_classes.MUXN(1, len(bcounts_i))
+                setattr(s, "input_wen_mux" + str(i), newmux)
+                for tt in range(len(bcounts_i)):
+                    currin = getattr(newmux, "in" + str(tt))
+                    i_order = (i - buffer_start_idxs[tt]) % \
+                        max_total_bcount
+                    if (i_order < bcounts_i[tt]):
+                        currin //= instport
+                    else:
+                        currin //= instport_new
+                newmux.sel //= layer_sel
+                wen_in //= newmux.out
 
-                    currmux = getattr(s, "input_data_mux" + str(i))
-                    currmux.sel //= instport
+                data_mux.sel //= instport
 
         utils.tie_off_clk_reset(s)
 
@@ -745,29 +691,28 @@ class MergeBusses(Component):
          :type ins_per_out: int
         """
         if (ins_per_out == 0):
-            ins_per_out = math.floor(out_width/in_width)
+            ins_per_out = out_width // in_width
         assert ins_per_out > 0
         num_ins_used = min(ins_per_out*num_outs, num_ins)
 
         # Add outputs to activation functions
-        utils.add_n_inputs(s, num_ins, in_width, "input_")
-        utils.add_n_outputs(s, num_outs, out_width, "output_")
-
-        # Add input and output ports from each MLB
-        for inp in range(num_ins_used):
-            bus_idx = (start_bus + math.floor(inp/ins_per_out)) % num_outs
-            bus_start = (inp % ins_per_out) * in_width
-            bus_end = ((inp % ins_per_out)+1) * in_width
-            input_bus = getattr(s, "input_"+str(inp))
-            output_bus = getattr(s, "output_"+str(bus_idx))
-            connect(input_bus[0:in_width], output_bus[bus_start:bus_end])
-
-        for i in range(num_outs):
-            output_bus = getattr(s, "output_" + str(i))
-            i_order = (i - start_bus) % num_outs
-            if i_order >= math.ceil(num_ins_used / ins_per_out):
+        input_buses = utils.add_n_inputs(s, num_ins, in_width, "input_")
+        output_buses = utils.add_n_outputs(s, num_outs, out_width, "output_")
+
+        # Fill each output bus in turn, starting from start_bus, with the
+        # next ins_per_out inputs, and tie off whatever is left over.
+        num_outs_used = -(-num_ins_used // ins_per_out)
+        for i_order in range(num_outs):
+            bus_idx = (start_bus + i_order) % num_outs
+            output_bus = output_buses[bus_idx]
+            if i_order >= num_outs_used:
                 output_bus //= 0
-            elif ((ins_per_out*in_width < out_width)):
+                continue
+            base = i_order * ins_per_out
+            for k in range(min(ins_per_out, num_ins_used - base)):
+                connect(input_buses[base + k][0:in_width],
+                        output_bus[k * in_width:(k + 1) * in_width])
+            if ((ins_per_out*in_width < out_width)):
                 output_bus[ins_per_out * in_width:out_width] //= 0
         utils.tie_off_clk_reset(s)
 
@@ -823,13 +768,11 @@ class WeightInterconnect(Component):
             mlb_width = mlb_width_used
         if (mlb_width == 0):
             return
-        streams_per_buffer = math.floor(buffer_width / mlb_width_used)
+        streams_per_buffer = buffer_width // mlb_width_used
 
-        buffers_per_stream = math.ceil(mlb_width_used / buffer_width)
+        buffers_per_stream = -(-mlb_width_used // buffer_width)
         assert mlb_width_used <= mlb_width
-        assert num_mlbs >= utils.get_var_product(
-            projection, [['G'], ['E'], ['C'], ['B'], ['PX'], ['PY'],
-                         ['RY'], ['RX']]), \
+        assert num_mlbs >= utils.get_mlb_count(projection), \
             "Insufficient number of MLBs"
         if (num_mlbs_used < 0):
             num_mlbs_used = num_mlbs
@@ -842,25 +785,31 @@ class WeightInterconnect(Component):
                     preload = True
                     preload_bus_count = pload_type["bus_count"]
 
-        assert preload or num_buffers >= math.ceil(
-            utils.get_var_product(projection,
-                                  [['G'], ['E'], ['C'], ['RY'], ['RX']]) *
-            mlb_width_used / buffer_width),\
+        assert preload or num_buffers >= -(
+            -utils.get_var_product(projection,
+                                   [['G'], ['E'], ['C'], ['RY'], ['RX']]) *
+            mlb_width_used // buffer_width),\
             "Insufficient number of weight buffers"
 
         # Add inputs from buffers
-        utils.add_n_inputs(s, num_buffers*num_banks, buffer_width,
-                           "inputs_from_buffer_")
+        buffer_ins = utils.add_n_inputs(s, num_buffers*num_banks,
+                                        buffer_width, "inputs_from_buffer_")
         if (num_banks > 1):
-            bank_sel = utils.AddInPort(s, math.ceil(math.log(num_banks, 2)),
-                                       "bank_sel")
-
+            bank_sel = utils.AddInPort(s, utils.clog2(num_banks), "bank_sel")
+
+        # Add the ports to and from every MLB up front, and keep track of
+        # which MLBs get connected.
+        mlb_outs = utils.add_n_outputs(s, num_mlbs, mlb_width,
+                                       "outputs_to_mlb_")
+        mlb_ins = utils.add_n_inputs(s, num_mlbs, mlb_width,
+                                     "inputs_from_mlb_")
+        connected_mlbs = set()
         if preload:
             assert mlb_width_used * preload_bus_count <= \
                 num_buffers * buffer_width
             # It doesn't matter in which order they are connected if things
             # are preloaded - just connect them in chains.
-            chain_len = math.ceil(num_mlbs_used / num_buffers)
+            chain_len = -(-num_mlbs_used // num_buffers)
             for chain in range(num_buffers):
                 start_idx = chain * chain_len
                 end_idx = min(num_mlbs_used - 1, start_idx + chain_len - 1)
@@ -868,26 +817,26 @@ class WeightInterconnect(Component):
                                                   "inputs_from_mlb_{}",
                                                   "outputs_to_mlb_{}",
                                                   mlb_width)
+                connected_mlbs.add(start_idx)
+                connected_mlbs.update(range(start_idx + 1, end_idx + 1))
 
                 # Then connect each chain input
                 assert streams_per_buffer > 0, "If preloading weights," + \
                     "the weight buffer data width must be at least as " + \
                     "wide as the ML block weight input"
-                input_bus_idx = math.floor(chain / streams_per_buffer)
+                input_bus_idx = chain // streams_per_buffer
                 if (num_banks > 1):
                     newmux = module_helper_classes.MUXN(buffer_width,
                                                         num_banks)
                     setattr(s, "bank_mux" + str(input_bus_idx), newmux)
                     for mm in range(num_banks):
                         currin = getattr(newmux, "in" + str(mm))
-                        inbus_mm = getattr(s, "inputs_from_buffer_" +
-                                           str(input_bus_idx + mm*num_buffers))
-                        currin //= inbus_mm
+                        currin //= buffer_ins[input_bus_idx +
+                                              mm*num_buffers]
                     input_bus = newmux.out
                     newmux.sel //= bank_sel
                 else:
-                    input_bus = getattr(s, "inputs_from_buffer_" +
-                                        str(input_bus_idx))
+                    input_bus = buffer_ins[input_bus_idx]
                 section_idx = chain % streams_per_buffer
                 input_bus_start = section_idx * mlb_width_used
                 input_bus_end = (section_idx + 1) * mlb_width_used
@@ -902,25 +851,39 @@ class WeightInterconnect(Component):
                         output_bus[input_bus_start:input_bus_end])
 
         else:
-            for (ug, ue, ubb, urny, urnc, urw, ubx, uby) in utils.range8D(
-                    projection['G'], projection['E'], projection['B'],
-                    projection['RY'], projection['C'], projection['RX'],
-                    projection['PX'], projection['PY']):
-                # Get instance number of the MLB
-                out_idx = utils.get_overall_idx(
-                    projection, {'RX': urw, 'C': urnc, 'RY': urny, 'B': ubb,
-                                 'E': ue, 'G': ug, 'PX': ubx, 'PY': uby})
-
-                # Create ports to and from the MLB
-                newout = utils.AddOutPort(s, mlb_width,
-                                          "outputs_to_mlb_" + str(out_idx))
-                newin = utils.AddInPort(s, mlb_width,
-                                        "inputs_from_mlb_" + str(out_idx))
+            if (dilx > 1):
+                assert(inner_projection)
+                num_weight_ins = utils.get_var_product(
+                    inner_projection, [['G'], ['E'], ['RY'], ['C']])
+                urwx = inner_projection.get('RX')
+                w_width = int(mlb_width_used / (urwx * num_weight_ins))
+                # Weight lanes as (start, end, kept by the dilation). This
+                # only depends on the outer RX index, so build it once.
+                dil_lanes = [[(w_width * (input_gen * urwx + weight_x),
+                               w_width * (input_gen * urwx + weight_x + 1),
+                               (urwx * urw + weight_x) % dilx == 0)
+                              for input_gen in range(num_weight_ins)
+                              for weight_x in range(urwx)]
+                             for urw in range(projection['RX'])]
+            # Compute the MLB instance and weight stream indices of every
+            # point in the unrolled projection up front.
+            keys = ['G', 'E', 'B', 'RY', 'C', 'RX', 'PX', 'PY']
+            grid = dict(zip(keys, numpy.indices(
+                [projection[key] for key in keys]).reshape(len(keys), -1)))
+            out_idxs = utils.get_overall_idx_array(projection, grid)
+            stream_idxs = utils.get_overall_idx_array(
+                projection, {key: grid[key]
+                             for key in ['RX', 'C', 'RY', 'E', 'G']})
+            for (urw, ubb, ubx, uby, out_idx, stream_idx) in zip(
+                    grid['RX'].tolist(), grid['B'].tolist(),
+                    grid['PX'].tolist(), grid['PY'].tolist(),
+                    out_idxs.tolist(), stream_idxs.tolist()):
+                # Ports to and from the MLB
+                newout = mlb_outs[out_idx]
+                newin = mlb_ins[out_idx]
+                connected_mlbs.add(out_idx)
 
                 # Connect all MLB weight inputs to buffers
-                stream_idx = utils.get_overall_idx(
-                    projection, {'RX': urw, 'C': urnc, 'RY': urny, 'E': ue,
-                                 'G': ug})
                 for buf_idx in range(buffers_per_stream):
                     if (buffers_per_stream > 1):
                         input_bus_idx = stream_idx * buffers_per_stream + \
@@ -928,8 +891,7 @@ class WeightInterconnect(Component):
                         section_idx = 0
                         output_bus_start = buf_idx * buffer_width
                     else:
-                        input_bus_idx = math.floor(stream_idx /
-                                                   streams_per_buffer)
+                        input_bus_idx = stream_idx // streams_per_buffer
                         section_idx = stream_idx % streams_per_buffer
                         output_bus_start = 0
                     if (num_banks > 1):
@@ -938,44 +900,29 @@ class WeightInterconnect(Component):
                         setattr(s, "bank_mux" + str(input_bus_idx), newmux)
                         for mm in range(num_banks):
                             currin = getattr(newmux, "in" + str(mm))
-                            inbus_mm = getattr(s, "inputs_from_buffer_" +
-                                               str(input_bus_idx +
-                                                   mm*num_buffers))
-                            currin //= inbus_mm
+                            currin //= buffer_ins[input_bus_idx +
+                                                  mm*num_buffers]
                         input_bus = newmux.out
                         newmux.sel //= bank_sel
                     else:
-                        input_bus = getattr(s, "inputs_from_buffer_" +
-                                            str(input_bus_idx))
+                        input_bus = buffer_ins[input_bus_idx]
                     input_bus_start = section_idx * mlb_width_used
                     input_bus_end = (section_idx + 1) * \
                         min(mlb_width_used, buffer_width)
                     output_bus_end = output_bus_start + min(mlb_width_used,
                                                             buffer_width)
                     if (dilx > 1):
-                        assert(inner_projection)
-                        num_weight_ins = utils.get_var_product(
-                            inner_projection, [['G'], ['E'], ['RY'], ['C']])
-                        for input_gen in range(num_weight_ins):
-                            urwx = inner_projection.get('RX')
-                            for weight_x in range(urwx):
-                                input_w = input_gen * urwx + weight_x
-                                w_width = int(mlb_width_used /
-                                              (urwx * num_weight_ins))
-                                start_w_idx = output_bus_start + \
-                                    w_width * input_w
-                                end_w_idx = output_bus_start + \
-                                    w_width * (input_w + 1)
-                                total_urw = (inner_projection.get('RX') *
-                                             urw + weight_x)
-                                if (total_urw % dilx == 0):
-                                    connect(newout[start_w_idx:end_w_idx],
-                                            input_bus[input_bus_start +
-                                                      start_w_idx:
-                                                      input_bus_start +
-                                                      end_w_idx])
-                                else:
-                                    newout[start_w_idx:end_w_idx] //= 0
+                        for (w_start, w_end, kept) in dil_lanes[urw]:
+                            start_w_idx = output_bus_start + w_start
+                            end_w_idx = output_bus_start + w_end
+                            if kept:
+                                connect(newout[start_w_idx:end_w_idx],
+                                        input_bus[input_bus_start +
+                                                  start_w_idx:
+                                                  input_bus_start +
+                                                  end_w_idx])
+                            else:
+                                newout[start_w_idx:end_w_idx] //= 0
                     else:
                         connect(newout[output_bus_start:output_bus_end],
                                 input_bus[input_bus_start:input_bus_end])
@@ -988,13 +935,7 @@ class WeightInterconnect(Component):
                         connect(newin[output_bus_start:output_bus_end],
                                 output_bus[input_bus_start:input_bus_end])
 
-        # Tie disconnected MLBs to 0
-        for i in range(num_mlbs):
-            if (("outputs_to_mlb_" + str(i)) not in s.__dict__.keys()):
-                newout = OutPort(mlb_width)
-                setattr(s, "outputs_to_mlb_" + str(i), newout)
-                newout //= 0
-            utils.AddInPort(s, mlb_width, "inputs_from_mlb_" + str(i))
+        utils.tie_off_unconnected_mlbs(s, num_mlbs, mlb_width, connected_mlbs)
         utils.tie_off_clk_reset(s)
 
 
@@ -1055,10 +996,7 @@ class InputInterconnect(Component):
             mlb_width = mlb_width_used
         streams_per_buffer = buffer_width / mlb_width_used
         assert mlb_width_used <= mlb_width
-        assert num_mlbs >= utils.get_var_product(projection,
-                                                 [['G'], ['E'], ['B'], ['PX'],
-                                                  ['PY'], ['C'], ['RY'],
-                                                  ['RX']]), \
+        assert num_mlbs >= utils.get_mlb_count(projection), \
             "Insufficient number of MLBs"
 
         buffers_per_stream = math.ceil(1 / streams_per_buffer)
@@ -1074,8 +1012,8 @@ class InputInterconnect(Component):
             streams_per_buffer = buffer_width / mlb_width_used
 
         # Add input ports from each buffer.
-        utils.add_n_inputs(s, num_buffers, full_buffer_width,
-                           "inputs_from_buffer_")
+        buffer_ins = utils.add_n_inputs(s, num_buffers, full_buffer_width,
+                                        "inputs_from_buffer_")
 
         # 2D convolution requires extra connectivity between buffers
         # and ML blocks. Figure out whether this is required:
@@ -1085,106 +1023,124 @@ class InputInterconnect(Component):
                        inner_projection.get('PY', 1))
         max_unci = int(inner_projection.get('C', 1))
         if (mux_urn and mux_size > 1):
-            s.urn_sel = InPort(math.ceil(math.log(max(mux_size, 2), 2)))
-            utils.tie_off_port(s, s.urn_sel)
+            s.urn_sel = InPort(utils.clog2(mux_size))
+            urn_sel = s.urn_sel
+            utils.tie_off_port(s, urn_sel)
+            muxes_per_filter = inner_projection['G'] * max_ubbi * \
+                max_unci * inner_projection.get('PY', 1)
+            # Which buffer each mux input comes from only depends on the
+            # inner loop indices, so group the mux inputs by buffer once
+            # rather than filtering all of them for every buffer of every
+            # chain. Each entry is (mux, inner RY index, inner instance
+            # index, offset within the buffer).
+            mux_ins_by_buf = {}
+            keys = ['G', 'B', 'C', 'PY', 'RY']
+            inner_dims = [inner_projection['G'], max_ubbi, max_unci,
+                          inner_projection['PY'], inner_projection['RY']]
+            inner_grid = dict(zip(keys, numpy.indices(inner_dims).reshape(
+                len(keys), -1)))
+            mlb_in_idxs = utils.get_overall_idx_array(
+                inner_projection, dict(inner_grid, PX=0),
+                order=utils.input_order)
+            for (ugi, ubbi, unci, unyi, mlb_in_idx) in zip(
+                    inner_grid['G'].tolist(), inner_grid['B'].tolist(),
+                    inner_grid['C'].tolist(), inner_grid['RY'].tolist(),
+                    mlb_in_idxs.tolist()):
+                buf = math.floor(mlb_in_idx / ins_per_buffer)
+                mux_ins_by_buf.setdefault(buf, []).append(
+                    (ugi * max_ubbi * max_unci + ubbi * max_unci + unci,
+                     unyi, mlb_in_idx,
+                     math.floor(unci % ins_per_buffer) * inner_width))
 
         # Add input and output ports from each MLB
         mux_count = 0
-        mlb_chains = []
-        for (ug, ue, ubb, urnc, ubx, uby, c, d) in utils.range8D(
-                projection['G'], projection['E'], projection['B'],
-                projection['C'], projection['PX'], projection['PY']):
+        streams_per_buf_int = math.floor(streams_per_buffer)
+        chain_len = projection['RX']
+        inner_ry = inner_projection.get('RY', 1)
+        section_w = min(buffer_width, mlb_width_used)
+        # Compute the chain and stream indices of every point in the
+        # unrolled projection (with RY = 0) up front. Both are linear in
+        # RY, so the remaining chains are a fixed stride away.
+        keys = ['G', 'E', 'B', 'C', 'PX', 'PY']
+        grid = dict(zip(keys, numpy.indices(
+            [projection[key] for key in keys]).reshape(len(keys), -1)))
+        chain_bases = utils.get_overall_idx_array(projection,
+                                                  dict(grid, RY=0))
+        stream_bases = utils.get_overall_idx_array(
+            projection, {'RY': 0, 'C': grid['C'], 'PY': grid['PY'],
+                         'PX': grid['PX'], 'B': grid['B'], 'G': grid['G']},
+            order=utils.input_order)
+        chain_ry_stride = utils.get_overall_idx_array(
+            projection, {'RY': 1, 'C': 0, 'B': 0, 'PX': 0, 'PY': 0, 'G': 0,
+                         'E': 0})
+        stream_ry_stride = utils.get_overall_idx_array(
+            projection, {'RY': 1, 'C': 0, 'PY': 0, 'PX': 0, 'B': 0, 'G': 0},
+            order=utils.input_order)
+        connected_mlbs = set()
+        for (ue, chain_base, stream_base) in zip(grid['E'].tolist(),
+                                                 chain_bases.tolist(),
+                                                 stream_bases.tolist()):
             muxs = []
             # For 2D convolution, mux between different buffer inputs
             # Create these muxes here - one for each filter
             if (mux_size > 1) and mux_urn:
-                for mi in range(inner_projection['G'] * max_ubbi *
-                                max_unci * inner_projection.get('PY', 1)):
+                for mi in range(muxes_per_filter):
                     newmux = module_helper_classes.MUX_NXN(inner_width,
                                                            mux_size)
                     muxs += [newmux]
                     setattr(s, "mux" + str(mux_count), newmux)
-                    newmux.sel //= s.urn_sel
+                    newmux.sel //= urn_sel
                     mux_count += 1
             # For each input stream...
             for urny in range(projection['RY']):
                 # Connect inputs between adjacent ML blocks where required.
-                chain_idx = utils.get_overall_idx(
-                    projection, {'RY': urny, 'C': urnc, 'B': ubb,
-                                 'PX': ubx, 'PY': uby, 'G': ug, 'E': ue})
-                start_idx = chain_idx * projection['RX']
-                end_idx = start_idx + projection['RX'] - 1
+                chain_idx = chain_base + urny * chain_ry_stride
+                start_idx = chain_idx * chain_len
+                end_idx = start_idx + chain_len - 1
                 newout, newin = utils.chain_ports(s, start_idx, end_idx,
                                                   "inputs_from_mlb_{}",
                                                   "outputs_to_mlb_{}",
                                                   mlb_width)
-                mlb_chains += [list(range(start_idx, end_idx + 1))]
+                connected_mlbs.update(range(start_idx, end_idx + 1))
 
                 # Connect the chain's input from a buffer (or many)
-                stream_idx = utils.get_overall_idx_new(
-                    projection, {'RY': urny, 'C': urnc, 'PY': uby,
-                                 'PX': ubx, 'B': ubb, 'G': ug},
-                    order=utils.input_order)
-                streams_per_buf_int = math.floor(streams_per_buffer)
+                stream_idx = stream_base + urny * stream_ry_stride
 
                 # If many buffers connect to this MLB, connect each one
                 for buf in range(buffers_per_stream):
                     input_bus_idx = stream_idx * buffers_per_stream + buf
                     input_bus_start = 0
                     if (streams_per_buffer > 1):
-                        input_bus_idx = math.floor(
-                            stream_idx / streams_per_buf_int)
+                        input_bus_idx = stream_idx // streams_per_buf_int
                         section_idx = stream_idx % streams_per_buf_int
                         input_bus_start = section_idx * mlb_width_used
                     i_order = (input_bus_idx + buffer_start_idx) % num_buffers
-                    input_bus = getattr(s, "inputs_from_buffer_" +
-                                        str(i_order))
+                    input_bus = buffer_ins[i_order]
                     if mux_urn and (mux_size > 1):
-                        # For each separate input image connected to this MLB:
-                        for (ugi, ubbi, unci, d) in utils.range4D(
-                                inner_projection['G'], max_ubbi, max_unci):
-                            # For each different input from that image,
-                            # Connect it to the mux.
-                            currmux = muxs[ugi * max_ubbi * max_unci +
-                                           ubbi * max_unci + unci]
-                            for (ubyi, unyi) in utils.range2D(
-                                    inner_projection['PY'],
-                                    inner_projection['RY']):
-                                mlb_in_idx = utils.get_overall_idx_new(
-                                    inner_projection,
-                                    {'RY': unyi, 'C': unci, 'PX': 0,
-                                     'PY': ubyi, 'B': ubbi, 'G': ugi},
-                                    order=utils.input_order)
-                                if (math.floor(mlb_in_idx / ins_per_buffer) ==
-                                        buf):
-                                    curr_uny = urny * \
-                                        inner_projection['RY'] + unyi
-                                    muxin = getattr(currmux, "in" +
-                                                    str(curr_uny))
-                                    muxout = getattr(currmux, "out" +
-                                                     str(curr_uny))
-                                    total_idx = input_bus_start + \
-                                        math.floor(unci %
-                                                   ins_per_buffer) * \
-                                        inner_width
-                                    connect(input_bus[total_idx:total_idx +
-                                                      inner_width], muxin)
-                                    if (curr_uny % dily == 0):
-                                        connect(muxout,
-                                                newout[mlb_in_idx *
-                                                       inner_width:
-                                                       (mlb_in_idx + 1) *
-                                                       inner_width])
-                                    else:
+                        # Connect each input from this buffer to its mux.
+                        for (mux_i, unyi, mlb_in_idx, buf_offset) in \
+                                mux_ins_by_buf.get(buf, []):
+                            currmux = muxs[mux_i]
+                            curr_uny = urny * inner_ry + unyi
+                            muxin = getattr(currmux, "in" + str(curr_uny))
+                            total_idx = input_bus_start + buf_offset
+                            connect(input_bus[total_idx:total_idx +
+                                              inner_width], muxin)
+                            if (curr_uny % dily == 0):
+                                muxout = getattr(currmux, "out" +
+                                                 str(curr_uny))
+                                connect(muxout,
                                         newout[mlb_in_idx * inner_width:
                                                (mlb_in_idx + 1) *
-                                               inner_width] //= 0
+                                               inner_width])
+                            else:
+                                newout[mlb_in_idx * inner_width:
+                                       (mlb_in_idx + 1) *
+                                       inner_width] //= 0
                     else:
-                        section_w = min(buffer_width, mlb_width_used)
                         buf_start_idx = buf * section_w
-                        connection_width = min(mlb_width,
-                                               buf_start_idx + section_w) - \
-                            buf_start_idx
+                        connection_width = min(section_w,
+                                               mlb_width - buf_start_idx)
                         connect(newout[buf_start_idx:buf_start_idx +
                                        connection_width],
                                 input_bus[input_bus_start:
@@ -1194,22 +1150,15 @@ class InputInterconnect(Component):
                         output_bus = utils.AddOutPort(s, buffer_width,
                                                       "outputs_to_buffer_" +
                                                       str(input_bus_idx))
-                        section_w = min(buffer_width, mlb_width_used)
                         buf_start_idx = buf*section_w
-                        connection_width = min(mlb_width, buf_start_idx +
-                                               (section_w)) - buf_start_idx
+                        connection_width = min(section_w,
+                                               mlb_width - buf_start_idx)
                         connect(newin[buf_start_idx:
                                       buf_start_idx + connection_width],
                                 output_bus[input_bus_start:
                                            input_bus_start + connection_width])
 
-        # Tie disconnected MLBs to 0
-        for i in range(num_mlbs):
-            if ("outputs_to_mlb_" + str(i) not in s.__dict__.keys()):
-                newout = OutPort(mlb_width)
-                setattr(s, "outputs_to_mlb_" + str(i), newout)
-                newout //= 0
-            utils.AddInPort(s, mlb_width, "inputs_from_mlb_" + str(i))
+        utils.tie_off_unconnected_mlbs(s, num_mlbs, mlb_width, connected_mlbs)
 
         utils.tie_off_clk_reset(s)
 
@@ -1261,43 +1210,45 @@ class OutputPSInterconnect(Component):
         """
         if mlb_width < 0:
             mlb_width = mlb_width_used
-        acts_per_stream = math.floor(mlb_width_used / af_width)
+        acts_per_stream = mlb_width_used // af_width
         assert mlb_width_used <= mlb_width
         assert mlb_width_used % af_width == 0, \
             "The activation input width should be a factor of the total " + \
             "output stream width"
         assert acts_per_stream > 0, "Activation function width too wide"
-        assert num_mlbs >= utils.get_var_product(
-            projection, [['G'], ['E'], ['B'], ['PX'], ['PY'],
-                         ['RY'], ['RX'], ['C']]), "Insufficient # of MLBs"
-        assert num_afs >= math.ceil(utils.get_var_product(
-            projection, [['G'], ['B'], ['PX'], ['PY'], ['E']])
-            * acts_per_stream), \
+        assert num_mlbs >= utils.get_mlb_count(projection), \
+            "Insufficient # of MLBs"
+        assert num_afs >= utils.get_var_product(
+            projection, [['G'], ['B'], ['PX'], ['PY'], ['E']]) * \
+            acts_per_stream, \
             "Insufficient number of activation functions"
 
         # Add outputs to activation functions
         outs_to_afs = utils.add_n_outputs(s, num_afs, af_width,
                                           "outputs_to_afs_")
         if (num_input_bufs > 0):
-            utils.add_n_inputs(s, num_input_bufs, input_buf_width,
-                               "ps_inputs_from_buffer_")
+            assert input_buf_width >= mlb_width_used
+            ps_ins = utils.add_n_inputs(s, num_input_bufs, input_buf_width,
+                                        "ps_inputs_from_buffer_")
+            streams_per_buffer = input_buf_width // mlb_width_used
 
         # Add input and output ports from each MLB
-        connected_outs = []
+        connected_afs = set()
+        connected_mlbs = set()
         output_chains = []
-        for (ug, ue, ubb, ubx, uby, a, b, c) in utils.range8D(
-                projection['G'], projection['E'], projection['B'],
-                projection['PX'], projection['PY']):
-            chain_idx = utils.get_overall_idx(
-                projection, {'B': ubb, 'G': ug, 'E': ue, 'PX': ubx, 'PY': uby})
-            chain_len = projection['RX'] * projection['C'] * \
-                projection['RY']
+        chain_len = projection['RX'] * projection['C'] * projection['RY']
+        keys = ['G', 'E', 'B', 'PX', 'PY']
+        grid = dict(zip(keys, numpy.indices(
+            [projection[key] for key in keys]).reshape(len(keys), -1)))
+        for chain_idx in utils.get_overall_idx_array(projection,
+                                                     grid).tolist():
             start_idx = chain_idx * chain_len
             end_idx = start_idx + chain_len - 1
             newout, newin = utils.chain_ports(s, start_idx, end_idx,
                                               "inputs_from_mlb_{}",
                                               "outputs_to_mlb_{}", mlb_width)
             output_chains += [list(range(start_idx, end_idx+1))]
+            connected_mlbs.update(range(start_idx, end_idx + 1))
 
             if (num_input_bufs == 0):
                 newout[0:mlb_width_used] //= 0
@@ -1305,38 +1256,26 @@ class OutputPSInterconnect(Component):
 
             # Connect input stream.
             if (num_input_bufs > 0):
-                assert input_buf_width >= mlb_width_used
-                streams_per_buffer = math.floor(input_buf_width /
-                                                mlb_width_used)
-                input_bus_idx = math.floor(chain_idx / streams_per_buffer)
+                input_bus_idx = chain_idx // streams_per_buffer
                 section_idx = chain_idx % streams_per_buffer
                 input_bus_start = section_idx * mlb_width_used
                 input_bus_end = (section_idx + 1) * mlb_width_used
-                input_bus = getattr(s, "ps_inputs_from_buffer_" +
-                                    str(input_bus_idx))
+                input_bus = ps_ins[input_bus_idx]
                 connect(input_bus[input_bus_start:input_bus_end],
                         newout[0:mlb_width_used])
 
             for out_part in range(acts_per_stream):
-                output_bus = getattr(s, "outputs_to_afs_" +
-                                     str(output_bus_idx + out_part))
-                connected_outs += [output_bus]
+                output_bus = outs_to_afs[output_bus_idx + out_part]
+                connected_afs.add(output_bus_idx + out_part)
                 output_bus_start = out_part * af_width
                 output_bus_end = (out_part + 1) * af_width
                 connect(output_bus, newin[output_bus_start:output_bus_end])
 
-        # Tie disconnected MLBs to 0
-        for i in range(num_mlbs):
-            if ("outputs_to_mlb_" + str(i) not in s.__dict__.keys()):
-                newout = OutPort(mlb_width)
-                setattr(s, "outputs_to_mlb_" + str(i), newout)
-                newout //= 0
-            newin = utils.AddInPort(s, mlb_width, "inputs_from_mlb_" +
-                                    str(i))
+        utils.tie_off_unconnected_mlbs(s, num_mlbs, mlb_width, connected_mlbs)
         # Tie disconnected outs to 0
-        for out in outs_to_afs:
-            if (out not in connected_outs):
-                out //= 0
+        for i in range(num_afs):
+            if i not in connected_afs:
+                outs_to_afs[i] //= 0
         utils.tie_off_clk_reset(s)
 
         with open('chain_list_for_placement.yaml', 'w') as file:
@@ -1390,49 +1329,35 @@ class Datapath(Component):
         MAC_datatypes = ['W', 'I', 'O']
         buffer_specs = {'W': wb_spec, 'I': ib_spec, 'O': ob_spec}
 
+        # Port widths of the MLB and buffers are the same for every
+        # projection, so add them up once.
+        mlb_total_widths = {dtype: utils.get_sum_datatype_width(mlb_spec,
+                                                                dtype)
+                            for dtype in MAC_datatypes}
+        mlb_in_widths = {dtype: utils.get_sum_datatype_width(mlb_spec, dtype,
+                                                             ["in"])
+                         for dtype in MAC_datatypes}
+        buf_in_widths = {dtype: utils.get_sum_datatype_width(
+            buffer_specs[dtype], 'DATA', ["in"]) for dtype in MAC_datatypes}
+
         # Calculate required MLB interface widths and print information
         inner_projs = [proj_spec['inner_projection']
                        for proj_spec in proj_specs]
         MAC_counts = [utils.get_mlb_count(inner_proj)
                       for inner_proj in inner_projs]
-        inner_bus_counts = {dtype: [utils.get_proj_stream_count(inner_proj,
-                                                                dtype)
-                                    for inner_proj in inner_projs]
-                            for dtype in MAC_datatypes}
-        inner_data_widths = {dtype: [proj_spec['data_widths'][dtype]
-                                     for proj_spec in proj_specs]
-                             for dtype in MAC_datatypes}
-        inner_bus_widths = {dtype: [inner_bus_count * inner_data_width
-                                    for (inner_bus_count, inner_data_width)
-                                    in zip(inner_bus_counts[dtype],
-                                           inner_data_widths[dtype])]
-                            for dtype in MAC_datatypes}
-
-        for (proj_spec, MAC_count, inner_bus_count, inner_data_width,
-             inner_bus_width) in zip(proj_specs, MAC_counts, inner_bus_counts,
-                                     inner_data_widths, inner_bus_widths):
-            print(utils.print_table("ML Block Details, Projection " +
-                                    proj_spec.get("name", "unnamed"),
-                                    [["Num MACs", MAC_count,
-                                      "(MACs within each MLB)"],
-                                     ["values/MLB, by type", inner_bus_counts,
-                                      "(number of in and out values / MLB)"],
-                                     ["data widths by type", inner_data_widths,
-                                      "(bit-width of each value)"],
-                                     ["total bus width, by type",
-                                      inner_bus_widths,
-                                      "(bit-width of MLB interface)"]], il) +
-                  "\n")
+        inner_bus_counts, inner_data_widths, inner_bus_widths = \
+            utils.get_inner_bus_info(proj_specs)
 
         # Check that this configuration is supported by the hardware model
-        assert MAC_count <= mlb_spec['MAC_info']['num_units']
+        mac_info = mlb_spec['MAC_info']
+        assert max(MAC_counts) <= mac_info['num_units']
         for dtype in MAC_datatypes:
-            for i in range(len(inner_bus_widths[dtype])):
-                if (utils.get_sum_datatype_width(mlb_spec, dtype) > 0):
-                    assert inner_bus_widths[dtype][i] <= \
-                        utils.get_sum_datatype_width(mlb_spec, dtype)
-                    assert (inner_data_widths[dtype][i] <=
-                            mlb_spec['MAC_info']['data_widths'][dtype]), \
+            if (mlb_total_widths[dtype] > 0):
+                for (inner_bus_width, inner_data_width) in zip(
+                        inner_bus_widths[dtype], inner_data_widths[dtype]):
+                    assert inner_bus_width <= mlb_total_widths[dtype]
+                    assert (inner_data_width <=
+                            mac_info['data_widths'][dtype]), \
                         "MLB width insufficient for inner projection"
 
         buffer_counts = utils.get_buffer_counts(proj_specs, ib_spec, ob_spec,
@@ -1443,34 +1368,44 @@ class Datapath(Component):
                        for proj_spec in proj_specs]
         MLB_counts = [utils.get_mlb_count(outer_proj)
                       for outer_proj in outer_projs]
-        outer_bus_counts = {dtype: [utils.get_proj_stream_count(outer_proj,
-                                                                dtype)
-                                    for outer_proj in outer_projs]
-                            for dtype in MAC_datatypes}
-        outer_bus_widths = {dtype: [outer_bus_count * inner_bus_width
-                                    for (outer_bus_count, inner_bus_width) in
-                                    zip(outer_bus_counts[dtype],
-                                        inner_bus_widths[dtype])]
-                            for dtype in MAC_datatypes}
-        total_bus_counts = {dtype: [outer_bus_count * inner_bus_count
-                            for (outer_bus_count, inner_bus_count) in
-                                    zip(outer_bus_counts[dtype],
-                                        inner_bus_counts[dtype])]
-                            for dtype in MAC_datatypes}
+        outer_bus_counts = {}
+        outer_bus_widths = {}
+        total_bus_counts = {}
+        for dtype in MAC_datatypes:
+            outer_bus_counts[dtype] = [
+                utils.get_proj_stream_count(outer_proj, dtype)
+                for outer_proj in outer_projs]
+            outer_bus_widths[dtype] = [
+                outer_bus_count * inner_bus_width
+                for (outer_bus_count, inner_bus_width)
+                in zip(outer_bus_counts[dtype], inner_bus_widths[dtype])]
+            total_bus_counts[dtype] = [
+                outer_bus_count * inner_bus_count
+                for (outer_bus_count, inner_bus_count)
+                in zip(outer_bus_counts[dtype], inner_bus_counts[dtype])]
         num_w_banks = 2 if pingpong_w else 1
         if (num_w_banks > 1):
-            utils.AddInPort(s, math.ceil(math.log(num_w_banks, 2)), "bank_sel")
-
-        max_input_buf_widths = [utils.get_max_input_bus_width(
-            utils.get_sum_datatype_width(buffer_specs['I'], "DATA", ["in"]),
-            proj, 'I') for proj in proj_specs]
-
-        for (proj_spec, MAC_count, outer_bus_width, total_bus_count) in \
-                zip(proj_specs, MAC_counts, outer_bus_widths,
-                    total_bus_counts):
-            print(utils.print_table("Dataflow Details, Projection " +
-                                    proj_spec.get("name", "unnamed"),
-                                    [["Num MLBs", MAC_count,
+            utils.AddInPort(s, utils.clog2(num_w_banks), "bank_sel")
+
+        # Print the MLB and dataflow details of each projection
+        for (proj_spec, MAC_count, MLB_count) in zip(proj_specs, MAC_counts,
+                                                     MLB_counts):
+            proj_name = proj_spec.get("name", "unnamed")
+            print(utils.print_table("ML Block Details, Projection " +
+                                    proj_name,
+                                    [["Num MACs", MAC_count,
+                                      "(MACs within each MLB)"],
+                                     ["values/MLB, by type", inner_bus_counts,
+                                      "(number of in and out values / MLB)"],
+                                     ["data widths by type", inner_data_widths,
+                                      "(bit-width of each value)"],
+                                     ["total bus width, by type",
+                                      inner_bus_widths,
+                                      "(bit-width of MLB interface)"]], il) +
+                  "\n\n" +
+                  utils.print_table("Dataflow Details, Projection " +
+                                    proj_name,
+                                    [["Num MLBs", MLB_count,
                                       "(Number of MLBs reqd for projection)"],
                                      ["total data widths by type",
                                       outer_bus_widths,
@@ -1482,14 +1417,6 @@ class Datapath(Component):
 
         # Instantiate MLBs, buffers
         # Allocate buffers for each layer
-        buffer_counts['I'] = [utils.get_num_buffers_reqd(buffer_specs['I'],
-                                                         outer_bus_count,
-                                                         inner_bus_width, mw)
-                              for (outer_bus_count, inner_bus_width, mw) in
-                              zip(outer_bus_counts['I'],
-                                  inner_bus_widths['I'],
-                                  max_input_buf_widths)]
-
         total_num_buffers = max(sum(x) for x in zip(buffer_counts['I'],
                                                     buffer_counts['O']))
         buffer_start_idxs = [sum(buffer_counts['I'][0:i+1]) %
@@ -1500,7 +1427,7 @@ class Datapath(Component):
                               for (a, b) in zip(ibuffer_start_idxs,
                                                 buffer_counts['I'])]
 
-        s.sel = InPort(math.ceil(math.log(max(len(proj_specs), 2), 2)))
+        s.sel = InPort(utils.clog2(len(proj_specs)))
         utils.tie_off_port(s, s.sel)
 
         buffer_fastgen = fast_gen if isinstance(fast_gen, bool) \
@@ -1515,7 +1442,7 @@ class Datapath(Component):
             projections=proj_specs, fast_gen=buffer_fastgen,
             add_SR=(("access_patterns" in mlb_spec) and
                     (mlb_spec["access_patterns"]["AP1"] <
-                     inner_projs[i]["RX"]) and (inner_projs[i]["RX"] > 1)),
+                     inner_projs[-1]["RX"]) and (inner_projs[-1]["RX"] > 1)),
             input_width=max(inner_data_widths['I']),
             buffer_start_idxs=ibuffer_start_idxs)
         mlb_fastgen = fast_gen if isinstance(fast_gen, bool) \
@@ -1524,25 +1451,28 @@ class Datapath(Component):
                                     projections=proj_specs,
                                     fast_gen=mlb_fastgen)
         s.input_act_modules.sel //= s.sel
+
+        # Suffixes for the names of the per-projection modules
+        proj_names = [""] + [proj_specs[i].get("name", i)
+                             for i in range(1, len(proj_specs))]
+        num_mlbs = max(MLB_counts)
+        num_afs = max(total_bus_counts['O'])
+        mlb_output_functions = mlb_spec.get('output_functions', [])
+        af_in_width = max(inner_data_widths['O'])
+        af_out_width = max(inner_data_widths['I'])
         activation_function_modules = []
-        for i in range(len(proj_specs)):
-            if not proj_specs[i]['activation_function'] in \
-               mlb_spec.get('output_functions', []):
-                func = proj_specs[i]['activation_function']
-            else:
+        for (proj_spec, proj_name) in zip(proj_specs, proj_names):
+            func = proj_spec['activation_function']
+            if func in mlb_output_functions:
                 func = "NONE"
             new_act_modules = ActivationWrapper(
-                count=max(total_bus_counts['O']),
+                count=num_afs,
                 function=func,
-                input_width=max(inner_data_widths['O']),
-                output_width=max(inner_data_widths['I']),
+                input_width=af_in_width,
+                output_width=af_out_width,
                 registered=False)
-            if (i > 0):
-                newname = proj_specs[i].get("name", i)
-            else:
-                newname = ""
             activation_function_modules += [new_act_modules]
-            setattr(s, "activation_function_modules" + newname,
+            setattr(s, "activation_function_modules" + proj_name,
                     new_act_modules)
 
         # Instantiate interconnects
@@ -1551,80 +1481,81 @@ class Datapath(Component):
         output_ps_interconnects = []
         output_interconnects = []
 
-        for i in range(len(proj_specs)):
-            if (i > 0):
-                newname = proj_specs[i].get("name", i)
-            else:
-                newname = ""
+        for i, (proj_spec, inner_proj) in enumerate(zip(proj_specs,
+                                                        inner_projs)):
+            newname = proj_names[i]
+            dilation = proj_spec.get("dilation", {})
             weight_interconnect = WeightInterconnect(
-                buffer_width=utils.get_sum_datatype_width(buffer_specs['W'],
-                                                          'DATA', ["in"]),
-                mlb_width=utils.get_sum_datatype_width(mlb_spec, 'W', ["in"]),
+                buffer_width=buf_in_widths['W'],
+                mlb_width=mlb_in_widths['W'],
                 mlb_width_used=inner_bus_widths['W'][i],
                 num_buffers=max(buffer_counts['W']),
-                num_mlbs=max(MLB_counts),
+                num_mlbs=num_mlbs,
                 projection=outer_projs[i],
-                inner_projection=inner_projs[i],
-                dilx=proj_specs[i].get("dilation", {}).get("x", 1),
+                inner_projection=inner_proj,
+                dilx=dilation.get("x", 1),
                 num_banks=num_w_banks
             )
             weight_interconnects += [weight_interconnect]
             setattr(s, "weight_interconnect" + newname, weight_interconnect)
             if (num_w_banks > 1):
                 weight_interconnect.bank_sel //= s.bank_sel
-            input_buf_width = utils.get_sum_datatype_width(buffer_specs['I'],
-                                                           'DATA', ["in"])
+            input_buf_width = buf_in_widths['I']
             mlb_width_used = inner_bus_widths['I'][i]
-            mlb_width = utils.get_sum_datatype_width(mlb_spec, 'I', ["in"])
+            mlb_width = mlb_in_widths['I']
             inner_width = inner_data_widths['I'][i]
-            buf_width = utils.get_sum_datatype_width(buffer_specs['I'],
-                                                     'DATA', ["in"])
+            buf_width = buf_in_widths['I']
 
             if (("access_patterns" in mlb_spec) and
                     (mlb_spec["access_patterns"]["AP1"] <
-                     inner_projs[i]["RX"])):
-                input_buf_width = input_buf_width * inner_projs[i]["RX"]
-                mlb_width_used = mlb_width_used * inner_projs[i]["RX"]
-                inner_width = inner_width * inner_projs[i]["RX"]
-                buf_width = buf_width * inner_projs[i]["RX"]
+                     inner_proj["RX"])):
+                input_buf_width = input_buf_width * inner_proj["RX"]
+                mlb_width_used = mlb_width_used * inner_proj["RX"]
+                inner_width = inner_width * inner_proj["RX"]
+                buf_width = buf_width * inner_proj["RX"]
 
             input_interconnect = InputInterconnect(
                 buffer_width=buf_width,
                 mlb_width=max(mlb_width, mlb_width_used),
                 mlb_width_used=mlb_width_used,
-                num_buffers=max(sum(x) for x in zip(buffer_counts['I'],
-                                                    buffer_counts['O'])),
-                num_mlbs=max(MLB_counts),
-                projection=proj_specs[i],
-                inner_projection=inner_projs[i],
+                num_buffers=total_num_buffers,
+                num_mlbs=num_mlbs,
+                projection=proj_spec,
+                inner_projection=inner_proj,
                 inner_width=inner_width,
                 mux_urn=True,
-                dily=proj_specs[i].get("dilation", {}).get("y", 1),
+                dily=dilation.get("y", 1),
                 buffer_start_idx=ibuffer_start_idxs[i]
             )
             setattr(s, "input_interconnect" + newname, input_interconnect)
             input_interconnects += [input_interconnect]
             output_ps_interconnect = OutputPSInterconnect(
                 af_width=inner_data_widths['O'][i],
-                mlb_width=utils.get_sum_datatype_width(mlb_spec, 'O', ["in"]),
+                mlb_width=mlb_in_widths['O'],
                 mlb_width_used=inner_bus_widths['O'][i],
-                num_afs=max(total_bus_counts['O']),
-                num_mlbs=max(MLB_counts),
+                num_afs=num_afs,
+                num_mlbs=num_mlbs,
                 projection=outer_projs[i])
             output_ps_interconnects += [output_ps_interconnect]
             setattr(s, "output_ps_interconnect" + newname,
                     output_ps_interconnect)
             output_interconnect = MergeBusses(
                 in_width=inner_data_widths['I'][i],
-                num_ins=max(total_bus_counts['O']),
-                out_width=utils.
-                get_sum_datatype_width(buffer_specs['O'], 'DATA', ["in"]),
-                num_outs=max(sum(x) for x in zip(buffer_counts['I'],
-                                                 buffer_counts['O'])),
+                num_ins=num_afs,
+                out_width=buf_in_widths['O'],
+                num_outs=total_num_buffers,
                 start_bus=obuffer_start_idxs[i])
             output_interconnects += [output_interconnect]
             setattr(s, "output_interconnect" + newname, output_interconnect)
 
+        # Look up the ports of each datatype on the MLB and buffers once
+        mlb_ports = {(dtype, dir): list(utils.get_ports_of_type(
+            mlb_spec, dtype, [dir]))
+            for dtype in MAC_datatypes for dir in ['in', 'out']}
+        buf_ports = {(dtype, dir): list(utils.get_ports_of_type(
+            buffer_specs[dtype], 'DATA', [dir]))
+            for dtype in MAC_datatypes for dir in ['in', 'out']}
+
         # Connect MLB sel
         modeports = list(utils.get_ports_of_type(mlb_spec, 'MODE', ["in"]))
         connected_ins = []
@@ -1634,20 +1565,19 @@ class Datapath(Component):
             mlb_sel_port //= s.sel
 
         # Connect weight interconnect
-        for portname in utils.get_ports_of_type(mlb_spec, 'W', ["out"]):
+        for portname in mlb_ports[('W', 'out')]:
             for i in range(len(proj_specs)):
                 weight_interconnect = weight_interconnects[i]
                 connected_ins += utils.connect_ports_by_name(
                     s.mlb_modules, portname["name"] + r"_(\d+)",
                     weight_interconnect, r"inputs_from_mlb_(\d+)")
 
-        for portname in utils.get_ports_of_type(mlb_spec, 'W', ["in"]):
+        for portname in mlb_ports[('W', 'in')]:
             connected_ins += utils.mux_ports_by_name(
                 s, weight_interconnects, r"outputs_to_mlb_(\d+)",
                 s.mlb_modules, portname["name"] + r"_(\d+)", insel=s.sel)
 
-        for portname in utils.get_ports_of_type(buffer_specs['W'], 'DATA',
-                                                ["out"]):
+        for portname in buf_ports[('W', 'out')]:
             for i in range(len(proj_specs)):
                 weight_interconnect = weight_interconnects[i]
                 connected_ins += utils.connect_ports_by_name(
@@ -1655,14 +1585,14 @@ class Datapath(Component):
                     weight_interconnect, r"inputs_from_buffer_(\d+)")
 
         # Connect input interconnect
-        for portname in utils.get_ports_of_type(mlb_spec, 'I', ["out"]):
+        for portname in mlb_ports[('I', 'out')]:
             for i in range(len(proj_specs)):
                 input_interconnect = input_interconnects[i]
                 connected_ins += utils.connect_ports_by_name(
                     s.mlb_modules,  portname["name"] + r"_(\d+)",
                     input_interconnect, r"inputs_from_mlb_(\d+)")
 
-        for portname in utils.get_ports_of_type(mlb_spec, 'I', ["in"]):
+        for portname in mlb_ports[('I', 'in')]:
             connected_ins += utils.mux_ports_by_name(s, input_interconnects,
                                                      r"outputs_to_mlb_(\d+)",
                                                      s.mlb_modules,
@@ -1670,8 +1600,7 @@ class Datapath(Component):
                                                      r"_(\d+)",
                                                      insel=s.sel)
 
-        for portname in utils.get_ports_of_type(buffer_specs['I'], 'DATA',
-                                                ["out"]):
+        for portname in buf_ports[('I', 'out')]:
             for i in range(len(proj_specs)):
                 input_interconnect = input_interconnects[i]
                 connected_ins += utils.connect_ports_by_name(
@@ -1679,13 +1608,13 @@ class Datapath(Component):
                     input_interconnect, r"inputs_from_buffer_(\d+)")
 
         # Connect partial sum interconnect
-        for portname in utils.get_ports_of_type(mlb_spec, 'O', ["out"]):
+        for portname in mlb_ports[('O', 'out')]:
             for i in range(len(proj_specs)):
                 output_ps_interconnect = output_ps_interconnects[i]
                 connected_ins += utils.connect_ports_by_name(
                     s.mlb_modules, portname["name"] + r"_(\d+)",
                     output_ps_interconnect, r"inputs_from_mlb_(\d+)")
-        for portname in utils.get_ports_of_type(mlb_spec, 'O', ["in"]):
+        for portname in mlb_ports[('O', 'in')]:
             connected_ins += utils.mux_ports_by_name(
                 s, output_ps_interconnects, r"outputs_to_mlb_(\d+)",
                 s.mlb_modules, portname["name"] + r"_(\d+)", insel=s.sel)
@@ -1701,40 +1630,38 @@ class Datapath(Component):
                 act_functions, r"activation_function_out_(\d+)",
                 output_interconnect, r"input_(\d+)")
 
-        for portname in utils.get_ports_of_type(buffer_specs['O'], 'DATA',
-                                                ["in"]):
+        for portname in buf_ports[('O', 'in')]:
             connected_ins += utils.mux_ports_by_name(
                 s, output_interconnects, r"output_(\d+)", s.input_act_modules,
                 portname["name"] + r"_(\d+)_out", insel=s.sel)
 
         # Connect output buffers to top
         for port in s.input_act_modules.get_output_value_ports():
-            for dout in utils.get_ports_of_type(buffer_specs['O'], 'DATA',
-                                                ["out"]):
+            for dout in buf_ports[('O', 'out')]:
                 if dout["name"] in port._dsl.my_name:
                     utils.connect_out_to_top(s, port, port._dsl.my_name)
 
         # Connect input and weight datain to a common port
-        utils.AddInPort(s, utils.get_sum_datatype_width(buffer_specs['I'],
-                                                        'DATA', ["in"]),
-                        "input_datain")
-        for port in utils.get_ports_of_type(buffer_specs['I'], 'DATA', ["in"]):
+        utils.AddInPort(s, buf_in_widths['I'], "input_datain")
+        for port in buf_ports[('I', 'in')]:
             connected_ins += utils.connect_inst_ports_by_name(
                 s, "input_datain", s.input_act_modules, port["name"])
-        utils.AddInPort(s, utils.get_sum_datatype_width(buffer_specs['W'],
-                                                        'DATA', ["in"]),
-                        "weight_datain")
-        for port in utils.get_ports_of_type(buffer_specs['W'], 'DATA', ["in"]):
+        utils.AddInPort(s, buf_in_widths['W'], "weight_datain")
+        for port in buf_ports[('W', 'in')]:
             connected_ins += utils.connect_inst_ports_by_name(s,
                                                               "weight_datain",
                                                               s.weight_modules,
                                                               port["name"])
+        # Connect all inputs not otherwise connected to top
+        connected_ins = set(connected_ins)
         for inst in [s.activation_function_modules, s.mlb_modules,
-                     s.mlb_modules, s.input_act_modules,
+                     s.input_act_modules,
                      s.weight_interconnect, s.output_ps_interconnect,
                      s.input_interconnect, s.weight_modules]:
+            inst_prefix = inst._dsl.my_name + "_"
             for port in (inst.get_input_value_ports()):
-                if (port._dsl.my_name not in s.__dict__.keys()) and \
+                port_name = port._dsl.my_name
+                if (port_name not in s.__dict__) and \
                    (port not in connected_ins):
-                    utils.connect_in_to_top(s, port, inst._dsl.my_name + "_" +
-                                            port._dsl.my_name + "_top")
+                    utils.connect_in_to_top(s, port, inst_prefix + port_name +
+                                            "_top")
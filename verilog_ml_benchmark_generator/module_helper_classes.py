@@ -28,7 +28,7 @@ class MUX_NXN(Component):
         assert(input_width > 0)
         assert(input_count > 0)
         utils.add_n_inputs(s, input_count, input_width, "in")
-        s.sel = InPort(math.ceil(math.log(max(input_count, 2), 2)))
+        s.sel = InPort(utils.clog2(input_count))
 
         for i in range(input_count):
             newout = utils.AddOutPort(s, input_width, "out" + str(i))
@@ -104,7 +104,7 @@ class MUXN(Component):
         for i in range(input_count):
             utils.AddInPort(s, input_width, "in" + str(i))
         utils.AddOutPort(s, input_width, "out")
-        sel_width = math.ceil(math.log(max(input_count, 2), 2))
+        sel_width = utils.clog2(input_count)
         utils.AddInPort(s, sel_width, "sel")
         half_width1 = 2**(sel_width-1)
         half_width2 = input_count - half_width1
@@ -504,8 +504,7 @@ class MAC(Component):
             if s.acc_en:
                 s.sum_out @= s.sum_reg.output_data + \
                     s.input_in_w * s.weight_in_w
-                s.sum_reg.input_data @= s.sum_reg.output_data + \
-                    s.input_in_w * s.weight_in_w
+                s.sum_reg.input_data @= s.sum_out
             else:
                 s.sum_out @= s.sum_in + s.input_out_w * s.weight_out_w
                 s.sum_reg.input_data @= s.input_in_w * s.weight_in_w
@@ -619,7 +618,7 @@ class MLB(Component):
         utils.AddInPort(s, 1, "ACC_EN")
         utils.AddInPort(s, max(bus_widths['O']), "O_IN")
         utils.AddOutPort(s, max(bus_widths['O']), "O_OUT")
-        s.sel = InPort(math.ceil(math.log(max(len(proj_specs), 2), 2)))
+        s.sel = InPort(utils.clog2(len(proj_specs)))
         utils.tie_off_port(s, s.sel)
         if (fast_gen):
             s.W_OUT //= 0
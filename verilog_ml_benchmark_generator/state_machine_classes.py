@@ -203,7 +203,7 @@ class SM_IterateThruAddresses(Component):
         s.state = Wire(4)
         s.skip_cnt = Wire(w_addr_width)
         s.repeat_count = Wire(repeat_x + 1)
-        sel_width = math.ceil(math.log(max(sel_count, 2), 2))
+        sel_width = utils.clog2(sel_count)
         s.w_urn_sel = Wire(sel_width * 2)
         s.urn_sel = OutPort(sel_width)
         swm = 0
@@ -668,17 +668,19 @@ class StateMachineEMIFSeparate(Component):
         s.input_addr_top_a = OutPort(addri_ports[0]["width"])
         s.input_addr_top_b = OutPort(addri_ports[0]["width"])
         s.output_addr_top = OutPort(addri_ports[0]["width"])
-        s.emif_address = OutPort(utils.get_sum_datatype_width(emif_spec,
-                                                              "AVALON_ADDRESS",
-                                                              "in"))
+        emif_addr_width = utils.get_sum_datatype_width(emif_spec,
+                                                       "AVALON_ADDRESS", "in")
+        emif_data_width = utils.get_sum_datatype_width(emif_spec,
+                                                       "AVALON_WRITEDATA",
+                                                       "in")
+        s.emif_address = OutPort(emif_addr_width)
         s.emif_read = OutPort(1)
         s.emif_write = OutPort(1)
-        s.emif_writedata = OutPort(utils.get_sum_datatype_width(
-            emif_spec, "AVALON_WRITEDATA", "in"))
-        s.urn_sel = OutPort(math.ceil(math.log(max(mux_size, 2), 2)))
+        s.emif_writedata = OutPort(emif_data_width)
+        s.urn_sel = OutPort(utils.clog2(mux_size))
         s.done = OutPort(1)
         # -- Input Ports
-        s.sel = InPort(math.ceil(math.log(max(num_layers, 2), 2)))
+        s.sel = InPort(utils.clog2(num_layers))
         s.sm_start = InPort(1)
         s.emif_waitrequest = InPort(1)
         s.emif_readdatavalid = InPort(1)
@@ -757,8 +759,7 @@ class StateMachineEMIFSeparate(Component):
             buffer_counts['W'][0] * bank_count,
             min(2 ** addrw_ports[0]["width"], total_weight_count),
             addrw_ports[0]["width"], dataw_ports[0]["width"],
-            utils.get_sum_datatype_width(emif_spec, "AVALON_ADDRESS", "in"),
-            utils.get_sum_datatype_width(emif_spec, "AVALON_WRITEDATA", "in"),
+            emif_addr_width, emif_data_width,
             w_address)
         utils.connect_out_to_top(s, s.load_wbufs_emif.buf_writedata,
                                  "wbuf_writedata")
@@ -771,8 +772,7 @@ class StateMachineEMIFSeparate(Component):
             buffer_counts['I'][0] + buffer_counts['O'][0],
             min(2 ** addri_ports[0]["width"], input_buffer_len),
             addri_ports[0]["width"], datai_ports[0]["width"],
-            utils.get_sum_datatype_width(emif_spec, "AVALON_ADDRESS", "in"),
-            utils.get_sum_datatype_width(emif_spec, "AVALON_WRITEDATA", "in"),
+            emif_addr_width, emif_data_width,
             i_address, buffer_counts['I'][0])
         utils.connect_out_to_top(s, s.load_ibufs_emif.buf_writedata,
                                  "ibuf_writedata")
@@ -832,8 +832,7 @@ class StateMachineEMIFSeparate(Component):
             buffer_counts['O'][0], min(2 ** addro_ports[0]["width"],
                                        total_out_count),
             addro_ports[0]["width"], datao_ports[0]["width"],
-            utils.get_sum_datatype_width(emif_spec, "AVALON_ADDRESS", "in"),
-            utils.get_sum_datatype_width(emif_spec, "AVALON_WRITEDATA", "in"),
+            emif_addr_width, emif_data_width,
             o_address, total_num_buffers,
             start_buffer=(buffer_counts['I'][0] + ibuf_start) %
             total_num_buffers)
@@ -1026,7 +1025,7 @@ class MultipleLayerSystem(Component):
 
         # Add top level ports
         s.synth_keep = OutPort(1)
-        s.sel = InPort(math.ceil(math.log(max(len(proj_specs), 2), 2)))
+        s.sel = InPort(utils.clog2(len(proj_specs)))
         s.sm_start = InPort(1)
 
         s.datapath = module_classes.Datapath(mlb_spec, wb_spec, ib_spec,
@@ -1180,12 +1179,13 @@ class MultipleLayerSystem(Component):
                                      "done", insel=s.sel, sim=False)
 
         # Connect all inputs not otherwise connected to top
+        connected_ins = set(connected_ins)
         for inst in statemachines + [s.datapath, s.emif_inst]:
             for port in (inst.get_input_value_ports()):
-                if (port._dsl.my_name not in s.__dict__.keys()) and \
+                if (port._dsl.my_name not in s.__dict__) and \
                    (port not in connected_ins):
                     utils.connect_in_to_top(s, port, port._dsl.my_name)
             for port in (inst.get_output_value_ports()):
-                if (port._dsl.my_name not in s.__dict__.keys()) and \
+                if (port._dsl.my_name not in s.__dict__) and \
                    (port not in connected_ins):
                     utils.connect_out_to_top(s, port, port._dsl.my_name)
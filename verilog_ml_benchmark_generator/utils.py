@@ -1,12 +1,19 @@
 """Utility functions"""
+import functools
+import itertools
 import math
 import re
 import sys
 import inspect
+from collections import defaultdict
 import activation_functions
 import module_helper_classes
 from pymtl3 import connect, Wire, InPort, OutPort
 input_order = [['C'], ['B'], ['PX'], ['G'], ['RY'], ['PY']]
+# Unrolling factors that multiply the number of streams of each datatype
+stream_factors = {'W': [['RX'], ['RY'], ['C'], ['E'], ['G']],
+                  'I': [['RY'], ['C'], ['B'], ['PX'], ['PY'], ['G']],
+                  'O': [['E'], ['B'], ['PX'], ['PY'], ['G']]}
 
 
 """
@@ -160,64 +167,58 @@ def get_var_product(projection, var_array):
     """
     product = 1
     for var in var_array:
-        if var[0] in projection:
-            assert var[0] in projection
-            if var[0] in projection:
-                if len(var) == 1:
-                    product *= int(projection[var[0]])
-                elif var[1] in projection[var[0]]:
-                    product *= int(projection[var[0]][var[1]])
+        val = projection.get(var[0])
+        if val is not None:
+            if len(var) == 1:
+                product *= int(val)
+            elif var[1] in val:
+                product *= int(val[var[1]])
     return product
 
 
+def get_inner_bus_info(proj_specs):
+    """ Calculate the number of streams, the data width and the total bus
+        width of each datatype at the inner instance boundary, for each
+        projection.
+
+        :param proj_specs: list of projection specifications
+        :return: dicts of lists keyed by datatype: (stream counts,
+                 data widths, bus widths)
+    """
+    inner_bus_counts = {}
+    inner_data_widths = {}
+    inner_bus_widths = {}
+    for dtype in ['W', 'I', 'O']:
+        inner_bus_counts[dtype] = [
+            get_proj_stream_count(proj_spec['inner_projection'], dtype)
+            for proj_spec in proj_specs]
+        inner_data_widths[dtype] = [proj_spec['data_widths'][dtype]
+                                    for proj_spec in proj_specs]
+        inner_bus_widths[dtype] = [
+            inner_bus_count * inner_data_width
+            for (inner_bus_count, inner_data_width)
+            in zip(inner_bus_counts[dtype], inner_data_widths[dtype])]
+    return inner_bus_counts, inner_data_widths, inner_bus_widths
+
+
 def get_buffer_counts(proj_specs, ib_spec, ob_spec, wb_spec):
     """ Calculate the number of each kind of buffer required """
-    inner_projs = [proj_spec['inner_projection']
-                   for proj_spec in proj_specs]
-    inner_bus_counts = {dtype: [get_proj_stream_count(inner_proj,
-                                                      dtype)
-                                for inner_proj in inner_projs]
-                        for dtype in ['W', 'I', 'O']}
-    inner_data_widths = {dtype: [proj_spec['data_widths'][dtype]
-                                 for proj_spec in proj_specs]
-                         for dtype in ['W', 'I', 'O']}
-    inner_bus_widths = {dtype: [inner_bus_count * inner_data_width
-                                for (inner_bus_count, inner_data_width)
-                                in zip(inner_bus_counts[dtype],
-                                       inner_data_widths[dtype])]
-                        for dtype in ['W', 'I', 'O']}
-    outer_projs = [proj_spec['outer_projection']
-                   for proj_spec in proj_specs]
-    outer_bus_counts = {dtype: [get_proj_stream_count(outer_proj,
-                                                      dtype)
-                                for outer_proj in outer_projs]
-                        for dtype in ['W', 'I', 'O']}
-    max_input_buf_widths = [get_max_input_bus_width(
-        get_sum_datatype_width(ib_spec, "DATA", ["in"]),
-        proj, 'I') for proj in proj_specs]
-    buffer_counts = {}
-    buffer_counts['I'] = [get_num_buffers_reqd(ib_spec,
-                                               outer_bus_count,
-                                               inner_bus_width, mw)
-                          for (outer_bus_count, inner_bus_width, mw) in
-                          zip(outer_bus_counts['I'],
-                              inner_bus_widths['I'],
-                              max_input_buf_widths)]
-    buffer_counts['O'] = [get_num_buffers_reqd(ob_spec,
-                                               outer_bus_counto *
-                                               inner_bus_counto,
-                                               inner_data_widthi)
-                          for (outer_bus_counto, inner_bus_counto,
-                               inner_data_widthi) in
-                          zip(outer_bus_counts["O"],
-                              inner_bus_counts["O"],
-                              inner_data_widths["I"])]
-    buffer_counts['W'] = [get_num_buffers_reqd(wb_spec,
-                                               outer_bus_countw,
-                                               inner_bus_widthw)
-                          for (outer_bus_countw, inner_bus_widthw) in
-                          zip(outer_bus_counts["W"],
-                              inner_bus_widths["W"])]
+    inner_bus_counts, inner_data_widths, inner_bus_widths = \
+        get_inner_bus_info(proj_specs)
+    ib_width = get_sum_datatype_width(ib_spec, "DATA", ["in"])
+    buffer_counts = {'W': [], 'I': [], 'O': []}
+    for i, proj_spec in enumerate(proj_specs):
+        outer_proj = proj_spec['outer_projection']
+        buffer_counts['I'] += [get_num_buffers_reqd(
+            ib_spec, get_proj_stream_count(outer_proj, 'I'),
+            inner_bus_widths['I'][i],
+            get_max_input_bus_width(ib_width, proj_spec, 'I'))]
+        buffer_counts['O'] += [get_num_buffers_reqd(
+            ob_spec, get_proj_stream_count(outer_proj, 'O') *
+            inner_bus_counts['O'][i], inner_data_widths['I'][i])]
+        buffer_counts['W'] += [get_num_buffers_reqd(
+            wb_spec, get_proj_stream_count(outer_proj, 'W'),
+            inner_bus_widths['W'][i])]
     return buffer_counts
 
 
@@ -240,32 +241,15 @@ def get_proj_stream_count(projection, dtype='WIO'):
         :param projection: unrolling factor vector
         :param dtype: datatype considered - all by default
     """
-    assert re.search(r"^[WIO]*$", dtype), "Unknown type " + dtype
+    assert set(dtype) <= set('WIO'), "Unknown type " + dtype
     sum = 0
-    if ('W' in dtype):
-        ws = get_var_product(projection, [['RX'], ['RY'], ['C'],
-                                          ['E'], ['G']])
-        if 'PRELOAD' in projection:
-            for pload in projection["PRELOAD"]:
-                if pload["dtype"] == 'W':
-                    ws = pload.get("bus_count", 1)
-        sum += ws
-    if ('I' in dtype):
-        wi = get_var_product(projection, [['RY'], ['C'], ['B'], ['PX'], ['PY'],
-                                          ['G']])
-        if 'PRELOAD' in projection:
-            for pload in projection["PRELOAD"]:
-                if pload["dtype"] == 'I':
-                    wi = pload.get("bus_count", 1)
-        sum += wi
-    if ('O' in dtype):
-        wo = get_var_product(projection, [['E'], ['B'], ['PX'], ['PY'],
-                                          ['G']])
-        if 'PRELOAD' in projection:
-            for pload in projection["PRELOAD"]:
-                if pload["dtype"] == 'O':
-                    wo = pload.get("bus_count", 1)
-        sum += wo
+    for curr_dtype in 'WIO':
+        if curr_dtype in dtype:
+            count = get_var_product(projection, stream_factors[curr_dtype])
+            for pload in projection.get("PRELOAD", []):
+                if pload["dtype"] == curr_dtype:
+                    count = pload.get("bus_count", 1)
+            sum += count
     return sum
 
 
@@ -289,6 +273,52 @@ def get_overall_idx_new(projection, idxs,
     return total
 
 
+def get_overall_idx_array(projection, idxs,
+                          order=['RX', 'RY', 'C', 'E', 'B', 'PX', 'PY', 'G']):
+    """ Calculate inner block instance numbers for whole arrays of
+        unrolling factor indices at once. This is the same arithmetic as
+        get_overall_idx, but the values of ``idxs`` may be numpy arrays
+        (of equal shape), and the bounds checks are left to the caller.
+
+        :param projection: unrolling factor vector
+        :param idxs: Arrays of unrolling factors to specify instances
+        :param order: Order of unrolling factors, either as names or as
+                      single element lists of names (as in input_order)
+    """
+    product = 1
+    total = 0
+    for item in order:
+        if isinstance(item, list):
+            item = item[0]
+        if item in idxs:
+            total = total + product * idxs[item]
+            product *= projection.get(item, 1)
+    return total
+
+
+@functools.lru_cache(maxsize=None)
+def get_chain_end_idxs(ug, ue, ub, upx, upy, chain_len):
+    """ Calculate the instance numbers of the last block in each chain of
+        ``chain_len`` blocks. Every wrapped block looks this up, so the
+        result is memoized.
+
+        :param ug: G unrolling factor
+        :param ue: E unrolling factor
+        :param ub: B unrolling factor
+        :param upx: PX unrolling factor
+        :param upy: PY unrolling factor
+        :param chain_len: Number of blocks in each chain
+    """
+    projection = {'G': ug, 'E': ue, 'B': ub, 'PX': upx, 'PY': upy}
+    end_idxs = set()
+    for (ugi, uei, ubi, ubx, uby, a, b, c) in range8D(ug, ue, ub, upx, upy):
+        chain_idx = get_overall_idx(
+            projection, {'B': ubi, 'G': ugi, 'E': uei, 'PX': ubx,
+                         'PY': uby})
+        end_idxs.add(chain_idx * chain_len + chain_len - 1)
+    return frozenset(end_idxs)
+
+
 def get_overall_idx(projection, idxs,
                     order=['RX', 'RY', 'C', 'E', 'B', 'PX', 'PY', 'G']):
     """ Calculate the inner block instance number based on loop unrolling
@@ -299,16 +329,18 @@ def get_overall_idx(projection, idxs,
     """
     product = 1
     total = 0
-    for item in idxs:
-        assert item in order
+    found = 0
     for item in order:
-        if item in idxs:
+        idx = idxs.get(item)
+        if idx is not None:
             assert item in projection
             val = projection[item]
-            assert idxs[item] < val
-            assert idxs[item] >= 0
-            total += product*idxs[item]
+            assert 0 <= idx < val
+            total += product * idx
             product *= val
+            found += 1
+    # Every index given must be one of the unrolling factors in order
+    assert found == len(idxs)
     return total
 
 
@@ -327,8 +359,8 @@ def get_ports_of_type(hw_spec, type, dir=["in", "out"]):
         :param type: Type to match
         :param dir: port directions to include - both by default
     """
-    return filter(lambda port: (port['type'] == type) and
-                  (port["direction"] in dir), hw_spec['ports'])
+    return (port for port in hw_spec['ports']
+            if (port['type'] == type) and (port["direction"] in dir))
 
 
 def get_sum_datatype_width(hw_spec, type, dir=['in', 'out']):
@@ -339,10 +371,8 @@ def get_sum_datatype_width(hw_spec, type, dir=['in', 'out']):
         :param type: Type to match
         :param dir: port directions to include - both by default
     """
-    return sum(map(lambda port: port['width']
-                   if ((port['type'] == type) and
-                       (port['direction'] in dir)) else 0,
-                   hw_spec['ports']))
+    return sum(port['width'] for port in hw_spec['ports']
+               if (port['type'] == type) and (port['direction'] in dir))
 
 
 def get_num_buffers_reqd(buffer_spec, stream_count, stream_width,
@@ -356,17 +386,15 @@ def get_num_buffers_reqd(buffer_spec, stream_count, stream_width,
                          isn't split between them.
     :param stream_width: Bit-width of each stream
     """
-    buffer_width = get_sum_datatype_width(buffer_spec, "DATA", ["in"])
-    buffer_width = min(max_buf_width, buffer_width)
+    data_width = get_sum_datatype_width(buffer_spec, "DATA", ["in"])
+    assert data_width > 0, "Buffer DATAOUT port width of zero"
+    buffer_width = min(max_buf_width, data_width)
 
-    streams_per_buffer = math.floor(buffer_width / stream_width)
-    buf_per_stream = math.ceil(stream_width / buffer_width)
+    streams_per_buffer = buffer_width // stream_width
     if (streams_per_buffer > 0):
-        buf_count = math.ceil(stream_count / streams_per_buffer)
+        buf_count = -(-stream_count // streams_per_buffer)
     else:
-        buf_count = buf_per_stream * stream_count
-    assert get_sum_datatype_width(buffer_spec, 'DATA', ["in"]) > 0, \
-        "Buffer DATAOUT port width of zero"
+        buf_count = -(-stream_width // buffer_width) * stream_count
     assert(buf_count > 0)
     return buf_count
 
@@ -503,6 +531,15 @@ Utility functions for adding to pyMTL models
 """
 
 
+def clog2(count):
+    """ Calculate the width of a select signal choosing between ``count``
+        options: ceil(log2(count)), but at least one bit.
+
+        :param count: Number of options (an integer)
+    """
+    return (max(count, 2) - 1).bit_length()
+
+
 def AddWire(s, width, newname):
     """ Create a new wire at level ``s`` (if it doesn't already
         exist), and name it ``newname``
@@ -511,7 +548,7 @@ def AddWire(s, width, newname):
         :param s: Module at which to create a new port
         :param newname: Name of port to be created
     """
-    if newname in s.__dict__.keys():
+    if newname in s.__dict__:
         return getattr(s, newname)
     else:
         neww = Wire(width)
@@ -527,8 +564,9 @@ def AddInPort(s, width, newname):
         :param s: Module at which to create a new port
         :param newname: Name of port to be created
     """
-    if newname in s.__dict__.keys():
-        return getattr(s, newname)
+    existing = s.__dict__.get(newname)
+    if existing is not None:
+        return existing
     else:
         newinport = InPort(width)
         setattr(s, newname, newinport)
@@ -545,14 +583,44 @@ def AddOutPort(s, width, newname):
         :param s: Module at which to create a new port
         :param newname: Name of port to be created
     """
-    if newname in s.__dict__.keys():
-        return getattr(s, newname)
+    existing = s.__dict__.get(newname)
+    if existing is not None:
+        return existing
     else:
         newoutport = OutPort(width)
         setattr(s, newname, newoutport)
         return newoutport
 
 
+def add_ports_by_type(s, spec):
+    """ Add a port at level ``s`` for each port in the hardware block
+        specification (other than clk and reset), and group them by type.
+        Outputs that aren't driven by a simulation model are tied to 0.
+
+        :param s: Module at which to create the ports
+        :param spec: Hardware block definition
+        :return: Dictionary mapping "<type>_<direction>" to a list of
+                 (port definition, port) tuples
+    """
+    ports_by_type = defaultdict(list)
+    special_outs = []
+    if "simulation_model" in spec:
+        special_outs = ["DATA", "W", "I", "O", "AVALON_READDATA",
+                        "AVALON_WAITREQUEST", "AVALON_READDATAVALID"]
+    for port in spec['ports']:
+        if not port["type"] in ("CLK", "RESET"):
+            if (port["direction"] == "in"):
+                newport = AddInPort(s, port["width"], port["name"])
+            else:
+                if port["name"] not in s.__dict__:
+                    newport = AddOutPort(s, port["width"], port["name"])
+                    if port["type"] not in special_outs:
+                        newport //= newport._dsl.Type(0)
+            typename = port["type"] + "_" + port["direction"]
+            ports_by_type[typename].append((port, newport))
+    return ports_by_type
+
+
 def connect_in_to_top(s, port, newname):
     """ Create a new input port at level ``s`` (if it doesn't already
         exist), and connect ``port`` to the new top level port.
@@ -562,7 +630,7 @@ def connect_in_to_top(s, port, newname):
         :param port: port of module instance instantiated within ``s``
         :param newname: Name of port to be created
     """
-    if port._dsl.my_name == "clk" or port._dsl.my_name == "reset":
+    if port._dsl.my_name in ("clk", "reset"):
         return
     newinport = AddInPort(s, port._dsl.Type, newname)
     port //= newinport
@@ -590,10 +658,8 @@ def add_n_wires(s, n, width, prefix, start_idx=0):
         :param start_idx: Index at which to start for port naming
         :param prefix: Prefix of names of new ports
     """
-    added_w = []
-    for i in range(start_idx, start_idx+n):
-        added_w += [AddWire(s, width, prefix + str(i))]
-    return added_w
+    return [AddWire(s, width, prefix + str(i))
+            for i in range(start_idx, start_idx+n)]
 
 
 def add_n_inputs(s, n, width, prefix, start_idx=0):
@@ -606,10 +672,8 @@ def add_n_inputs(s, n, width, prefix, start_idx=0):
         :param start_idx: Index at which to start for port naming
         :param prefix: Prefix of names of new ports
     """
-    added_ins = []
-    for i in range(start_idx, start_idx+n):
-        added_ins += [AddInPort(s, width, prefix + str(i))]
-    return added_ins
+    return [AddInPort(s, width, prefix + str(i))
+            for i in range(start_idx, start_idx+n)]
 
 
 def add_n_outputs(s, n, width, prefix, start_idx=0):
@@ -622,10 +686,8 @@ def add_n_outputs(s, n, width, prefix, start_idx=0):
         :param start_idx: Index at which to start for port naming
         :param prefix: Prefix of names of new ports
     """
-    added_outs = []
-    for i in range(start_idx, start_idx+n):
-        added_outs += [AddOutPort(s, width, prefix + str(i))]
-    return added_outs
+    return [AddOutPort(s, width, prefix + str(i))
+            for i in range(start_idx, start_idx+n)]
 
 
 def tie_off_clk_reset(s):
@@ -660,6 +722,23 @@ def chain_ports(s, start_idx, end_idx, in_name, out_name, width=8):
     return AddOutPort(s, width, p1name), AddInPort(s, width, p2name)
 
 
+def tie_off_unconnected_mlbs(s, num_mlbs, width, connected_mlbs):
+    """ Add the outputs_to_mlb_<i> and inputs_from_mlb_<i> ports of MLBs
+        that were not connected, and tie the outputs to 0. Connected MLBs
+        are expected to have both ports already (eg. from chain_ports).
+
+        :param s: Interconnect module
+        :param num_mlbs: Total number of MLBs
+        :param width: Width of the MLB ports
+        :param connected_mlbs: Indices of MLBs that were connected
+    """
+    for i in range(num_mlbs):
+        if i not in connected_mlbs:
+            newout = AddOutPort(s, width, "outputs_to_mlb_" + str(i))
+            newout //= 0
+            AddInPort(s, width, "inputs_from_mlb_" + str(i))
+
+
 def tie_off_port(s, port):
     """ Create internal wire and connect it to ``port``
         This is helpful because ODIN will error out otherwise.
@@ -667,8 +746,9 @@ def tie_off_port(s, port):
         :param s: Module at which to tie off clk and reset
         :param port: Port to tie off
     """
-    newwire = Wire(port._dsl.Type.nbits)
-    setattr(s, port._dsl.my_name + "_tieoff", newwire)
+    port_dsl = port._dsl
+    newwire = Wire(port_dsl.Type.nbits)
+    setattr(s, port_dsl.my_name + "_tieoff", newwire)
     newwire //= port
 
 
@@ -702,12 +782,14 @@ def mux_ports_by_name(s, srcs, name1, inst2, name2, factor1=1, factor2=1,
     connected_ins = []
     connected_outs = []
     common_ports = []
+    pattern1 = re.compile("^" + name1 + r"$")
+    pattern2 = re.compile("^" + name2 + r"$")
 
     # Make a list of matching source ports.
     for src in srcs:
         for port in src.get_output_value_ports():
             port1name = port._dsl.my_name
-            foundname1 = re.search("^" + name1+r"$", port1name)
+            foundname1 = pattern1.search(port1name)
             if foundname1:
                 if (len(foundname1.groups()) > 0):
                     matching_name = str(int(foundname1.group(1))*factor1)
@@ -724,7 +806,7 @@ def mux_ports_by_name(s, srcs, name1, inst2, name2, factor1=1, factor2=1,
     # For each output, add a mux between all inputs and connect it.
     for port in inst2.get_input_value_ports():
         port2name = port._dsl.my_name
-        foundname2 = re.search("^" + name2+r"$", port2name)
+        foundname2 = pattern2.search(port2name)
 
         if foundname2:
             if (len(foundname2.groups()) > 0):
@@ -775,14 +857,16 @@ def connect_ports_by_name(inst1, name1, inst2, name2, factor1=1, factor2=1):
     connected_ins = []
     connected_outs = []
     common = None
+    pattern1 = re.compile("^" + name1 + r"$")
+    pattern2 = re.compile("^" + name2 + r"$")
 
     # Iterate through ports on the first instance and add them to a list.
     for port in inst1.get_output_value_ports():
         port1name = port._dsl.my_name
-        foundname1 = re.search("^" + name1+r"$", port1name)
+        foundname1 = pattern1.search(port1name)
         if foundname1:
             if (len(foundname1.groups()) > 0):
-                match_dict[str(int(foundname1.group(1)) * factor1)] = port
+                match_dict[int(foundname1.group(1)) * factor1] = port
             else:
                 common = port
 
@@ -794,18 +878,16 @@ def connect_ports_by_name(inst1, name1, inst2, name2, factor1=1, factor2=1):
     # Iterate through ports on the second instance to find matches.
     for port in inst2.get_input_value_ports():
         port2name = port._dsl.my_name
-        foundname2 = re.search("^" + name2+r"$", port2name)
+        foundname2 = pattern2.search(port2name)
         if foundname2:
-            matching_name = str(int(foundname2.group(1)) * factor2)
-            assert (matching_name in match_dict) or common, \
+            matching_idx = int(foundname2.group(1)) * factor2
+            assert (matching_idx in match_dict) or common, \
                 "Should have found output with name equivalent to " + \
                 port2name + " in " + str(match_dict)
-            connectport = match_dict.get(matching_name, common)
+            connectport = match_dict.pop(matching_idx, common)
             connectport //= port
-            connected_ins += [port]
-            connected_outs += [connectport]
-            if (matching_name in match_dict):
-                del match_dict[matching_name]
+            connected_ins.append(port)
+            connected_outs.append(connectport)
     return connected_ins + connected_outs
 
 
@@ -827,19 +909,20 @@ def connect_inst_ports_by_name(parent, namep, inst, namei,
         list(inst.get_input_value_ports())
     foundport = 0
     connected_ins = []
+    pattern = re.compile("^" + namei + r"_(\d+)$")
 
     # Iterate through ports of the instance and find the corresponding
     # port at the parent level.
     for port in instports:
-        foundname1 = re.search("^" + namei+r"_(\d+)$", port._dsl.my_name)
+        foundname1 = pattern.search(port._dsl.my_name)
         if foundname1:
             foundport = True
             parentport = None
             # Check if there is a matching port on the parent.
-            if namep + "_" + foundname1.group(1) in parent.__dict__.keys():
+            if namep + "_" + foundname1.group(1) in parent.__dict__:
                 parentport = getattr(parent, namep + "_" +
                                      foundname1.group(1))
-            elif namep in parent.__dict__.keys():
+            elif namep in parent.__dict__:
                 parentport = getattr(parent, namep)
 
             # If there is no matching port, add one.
@@ -877,10 +960,11 @@ def mux_inst_ports_by_name(inst2, name2, srcs, name1, factor1=1, factor2=1,
     match_dict = {}
     connected_ins = []
     connected_outs = []
+    pattern1 = re.compile("^" + name1 + r"$")
     for src in srcs:
         for port in src.get_output_value_ports():
             port1name = port._dsl.my_name
-            foundname1 = re.search("^" + name1+r"$", port1name)
+            foundname1 = pattern1.search(port1name)
             if foundname1:
                 if (len(foundname1.groups()) > 0):
                     matching_name = str(int(foundname1.group(1))*factor1)
@@ -902,7 +986,7 @@ def mux_inst_ports_by_name(inst2, name2, srcs, name1, factor1=1, factor2=1,
         # if parentname in inst2.__dict__.keys():
         #     parentport = getattr(inst2, name2 + "_" + foundname1.group(1))
         # elif name2 in inst2.__dict__.keys():
-        assert(name2 in inst2.__dict__.keys())
+        assert(name2 in inst2.__dict__)
         parentport = getattr(inst2, name2)
         inports = match_dict[port]
         muxn_inst = module_helper_classes.MUXN(parentport._dsl.Type.nbits,
@@ -1252,15 +1336,8 @@ def range8D(a=1, b=1, c=1, d=1, e=1, f=1, g=1, h=1):
 
         :param a-f: loop dimensions
     """
-    for ai in range(a):
-        for bi in range(b):
-            for ci in range(c):
-                for di in range(d):
-                    for ei in range(e):
-                        for fi in range(f):
-                            for gi in range(g):
-                                for hi in range(h):
-                                    yield(ai, bi, ci, di, ei, fi, gi, hi)
+    return itertools.product(range(a), range(b), range(c), range(d),
+                             range(e), range(f), range(g), range(h))
 
 
 def range4D(a=1, b=1, c=1, d=1):
@@ -1268,11 +1345,7 @@ def range4D(a=1, b=1, c=1, d=1):
 
         :param a-f: loop dimensions
     """
-    for ai in range(a):
-        for bi in range(b):
-            for ci in range(c):
-                for di in range(d):
-                    yield(ai, bi, ci, di)
+    return itertools.product(range(a), range(b), range(c), range(d))
 
 
 def range2D(a=1, b=1):
@@ -1280,9 +1353,7 @@ def range2D(a=1, b=1):
 
         :param a-f: loop dimensions
     """
-    for ai in range(a):
-        for bi in range(b):
-            yield(ai, bi)
+    return itertools.product(range(a), range(b))
 
 
 def negate(inval, width):